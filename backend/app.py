@@ -1,9 +1,33 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-from models import db, User, StudentProfile, GrowthPath, ProgressTracker, ProfessionalProfile, SimulatedTrend, RoadmapConversation, UserPreferences
-from gemini_service import GeminiService, RoadmapAssistant
+from sqlalchemy.exc import IntegrityError
+from models import db, User, StudentProfile, GrowthPath, ProgressTracker, ProfessionalProfile, SimulatedTrend, RoadmapConversation, UserPreferences, BackgroundJob, StagedMonth
+from gemini_service import GeminiService, RoadmapAssistant, AsyncGeminiService, AsyncRoadmapAssistant
+from llm_backends import get_backend_name
+from llm_runner import run_llm
+from singleflight import endpoint_flight, make_flight_key, llm_flight, async_llm_flight
+from llm_cache import get_response_cache
+from model_router import get_model_router
+from resilience import breaker_states
+from rate_limiter import get_rate_limiter, stop_tracking_model_calls, track_model_calls
+from structured_output import parse_stats
+from metrics import registry, http_request_seconds
+from jobs import JobWorker, enqueue_job, job_handler, job_stats
+from roadmap_extender import RoadmapExtender
+from conversation_memory import fold_conversation, get_progress_overview, load_chat_memory
+from intent_classifier import chat_routes, classify_intent, templated_reply
+from deadlines import BACKFILL_DELAY_SECONDS, backfills, run_with_deadline
+from migrations import run_migrations
+from progress_stats import get_completed_phases, month_completion_rate, progress_summary
+from trackers import insert_trackers, materialize_roadmap, month_plan_tracker_rows
 from datetime import datetime
+import contextvars
+import copy
+import json
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -21,13 +45,19 @@ db.init_app(app)
 
 # Initialize Gemini service
 gemini_api_key = os.getenv('GEMINI_API_KEY')
-if not gemini_api_key:
+if not gemini_api_key and get_backend_name() != 'fake':
     print("WARNING: GEMINI_API_KEY not found in environment variables")
     gemini_service = None
     roadmap_assistant = None
+    async_gemini_service = None
+    async_roadmap_assistant = None
 else:
     gemini_service = GeminiService(gemini_api_key)
     roadmap_assistant = RoadmapAssistant(gemini_api_key)
+    # Coroutine-based variants used by the slow generation/chat routes; their calls
+    # run on a shared background event loop with bounded concurrency (see llm_runner)
+    async_gemini_service = AsyncGeminiService(gemini_api_key)
+    async_roadmap_assistant = AsyncRoadmapAssistant(gemini_api_key)
 
 
 # ============================================================================
@@ -64,69 +94,65 @@ def get_user_context(user_id):
     }
 
 
-def create_trackers_for_phase(user_id, phase):
-    """Helper to create progress trackers for a roadmap phase"""
-    phase_num = phase.get('phase', 1)
-    
-    # Add courses
-    for course in phase.get('courses', []):
-        tracker = ProgressTracker(
-            user_id=user_id,
-            item_id=course['id'],
-            item_type='course',
-            item_name=course['name'],
-            status='not_started',
-            phase=phase_num
-        )
-        db.session.add(tracker)
+def get_profile_generation_data(profile):
+    """Profile fields used as input for roadmap generation"""
+    return {
+        'major': profile.major,
+        'university': profile.university,
+        'career_aspirations': profile.career_aspirations,
+        'experience_level': profile.experience_level,
+        'target_industries': profile.get_target_industries(),
+        'current_skills': profile.get_skills(),
+        'preferred_content_types': profile.get_preferred_content_types(),
+        'time_commitment': profile.time_commitment
+    }
 
-    # Add tests
-    for test in phase.get('tests', []):
-        tracker = ProgressTracker(
-            user_id=user_id,
-            item_id=test['id'],
-            item_type='test',
-            item_name=test['name'],
-            status='not_started',
-            phase=phase_num
-        )
-        db.session.add(tracker)
 
-    # Add internships
-    for internship in phase.get('internships', []):
-        tracker = ProgressTracker(
-            user_id=user_id,
-            item_id=internship['id'],
-            item_type='internship',
-            item_name=internship.get('type', internship.get('name', 'Internship')),
-            status='not_started',
-            phase=phase_num
-        )
-        db.session.add(tracker)
+def get_analysis_input(profile):
+    """Profile fields used as input for profile analysis"""
+    return {
+        'major': profile.major,
+        'university': profile.university,
+        'gpa': profile.gpa,
+        'career_aspirations': profile.career_aspirations,
+        'current_skills': profile.get_skills(),
+        'experience_level': profile.experience_level,
+        'target_industries': profile.get_target_industries(),
+        'preferred_learning': profile.preferred_learning,
+        'preferred_content_types': profile.get_preferred_content_types(),
+        'time_commitment': profile.time_commitment
+    }
 
-    # Add certificates
-    for cert in phase.get('certificates', []):
-        tracker = ProgressTracker(
-            user_id=user_id,
-            item_id=cert['id'],
-            item_type='certificate',
-            item_name=cert['name'],
-            status='not_started',
-            phase=phase_num
-        )
-        db.session.add(tracker)
 
-    # Add projects
-    for project in phase.get('projects', []):
-        tracker = ProgressTracker(
-            user_id=user_id,
-            item_id=project['id'],
-            item_type='project',
-            item_name=project['name'],
-            status='not_started',
-            phase=phase_num
-        )
-        db.session.add(tracker)
+def get_month_profile_data(profile):
+    """Profile fields used as input for single-month generation"""
+    return {
+        'major': profile.major,
+        'career_aspirations': profile.career_aspirations,
+        'current_skills': profile.get_skills()
+    }
+
+
+def get_preferences_key(user_id, preferences_data):
+    """Fingerprint of the preferences that shape month generation"""
+    return make_flight_key(user_id, 'preferences', {
+        'project_ratio': preferences_data['project_ratio'],
+        'pace': preferences_data['pace'],
+        'focus_areas': preferences_data['focus_areas']
+    })
+
+
+def add_professional_profile(user_id):
+    """Create the user's professional profile, or return the one a concurrent request just created"""
+    profile = ProfessionalProfile(user_id=user_id)
+    db.session.add(profile)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # One profile per user (uq_professional_profiles_user_id); the other insert won
+        db.session.rollback()
+        profile = ProfessionalProfile.query.filter_by(user_id=user_id).first()
+    return profile
 
 
 # ============================================================================
@@ -212,34 +238,27 @@ def onboard_user():
     profile.set_extracurricular_interests(data.get('extracurricular_interests', []))
     profile.planning_horizon_years = data.get('planning_horizon_years', 1)
 
-    # Analyze profile with Gemini
+    # Analyze profile with Gemini. Past the deadline, a generic analysis is
+    # stored as provisional and replaced by a backfill job.
     if gemini_service:
-        try:
-            analysis = gemini_service.analyze_student_profile({
-                'major': profile.major,
-                'university': profile.university,
-                'gpa': profile.gpa,
-                'career_aspirations': profile.career_aspirations,
-                'current_skills': profile.get_skills(),
-                'experience_level': profile.experience_level,
-                'target_industries': profile.get_target_industries(),
-                'preferred_learning': profile.preferred_learning,
-                'preferred_content_types': profile.get_preferred_content_types(),
-                'time_commitment': profile.time_commitment
-            })
-            profile.set_analysis(analysis)
-        except Exception as e:
-            print(f"Error analyzing profile: {e}")
-            profile.set_analysis({
-                'strengths': ['Motivated learner'],
-                'gaps': ['Need more experience'],
-                'career_paths': ['Professional'],
-                'learning_tips': ['Start with basics']
-            })
+        analysis = run_with_deadline('onboard_analysis', gemini_service.analyze_student_profile,
+                                     get_analysis_input(profile), use_fallback=False)
+        profile.analysis_provisional = analysis is None
+        profile.set_analysis(analysis or {
+            'strengths': ['Motivated learner'],
+            'gaps': ['Need more experience'],
+            'career_paths': ['Professional'],
+            'learning_tips': ['Start with basics']
+        })
 
     user.onboarding_complete = True
 
     db.session.add(profile)
+    # Staged month plans were generated from the previous profile
+    invalidate_staged_months(user_id)
+    if profile.analysis_provisional:
+        enqueue_job('backfill_profile_analysis', user_id=user_id, dedupe_key=f"backfill_profile_analysis:{user_id}",
+                    delay_seconds=BACKFILL_DELAY_SECONDS)
     db.session.commit()
 
     return jsonify({
@@ -318,27 +337,34 @@ def generate_growth_path():
     if not gemini_service:
         return jsonify({'error': 'Gemini service not available'}), 503
 
+    # A double-click or client retry joins the generation already in flight
+    # instead of running a second one and re-creating every tracker
+    flight_key = make_flight_key(user_id, 'growth_path', {'timeline_months': timeline_months})
+    payload, status_code = endpoint_flight.do(
+        flight_key,
+        lambda: build_growth_path(user_id, profile, timeline_months)
+    )
+    return jsonify(payload), status_code
+
+
+def build_growth_path(user_id, profile, timeline_months):
+    """Generate and persist a new active growth path, returns (payload, status)"""
     try:
         # Generate roadmap with Gemini
-        roadmap = gemini_service.generate_growth_path(
-            profile_data={
-                'major': profile.major,
-                'university': profile.university,
-                'career_aspirations': profile.career_aspirations,
-                'experience_level': profile.experience_level,
-                'target_industries': profile.get_target_industries(),
-                'current_skills': profile.get_skills(),
-                'preferred_content_types': profile.get_preferred_content_types(),
-                'time_commitment': profile.time_commitment
-            },
+        roadmap = run_llm(async_gemini_service.generate_growth_path_fanout(
+            profile_data=get_profile_generation_data(profile),
             analysis=profile.get_analysis(),
             timeline_months=timeline_months
-        )
+        ))
+        if len(roadmap.get('phases', [])) != timeline_months:
+            raise RuntimeError(f"expected {timeline_months} months, got {len(roadmap.get('phases', []))}")
 
         # Deactivate previous growth paths
         GrowthPath.query.filter_by(user_id=user_id).update({'is_active': False})
         # Clear existing progress trackers to avoid duplicates
         ProgressTracker.query.filter_by(user_id=user_id).delete()
+        # Month plans staged for the old roadmap no longer apply
+        invalidate_staged_months(user_id, consumed=True)
 
         # Save growth path
         growth_path = GrowthPath(
@@ -346,25 +372,129 @@ def generate_growth_path():
             phase=1,
             is_active=True
         )
-        growth_path.set_roadmap(roadmap)
+        phases = growth_path.set_roadmap(roadmap)
 
         db.session.add(growth_path)
-        db.session.commit()
 
-        # Initialize progress trackers for all items
-        for phase in roadmap.get('phases', []):
-            create_trackers_for_phase(user_id, phase)
+        # Initialize progress trackers for all items; the old roadmap is only
+        # replaced once the new one and all its trackers are written
+        materialize_roadmap(user_id, phases)
 
         db.session.commit()
 
-        return jsonify({
+        return {
             'message': 'Growth path generated successfully',
             'growth_path': growth_path.to_dict()
-        }), 201
+        }, 201
 
     except Exception as e:
         print(f"Error generating growth path: {e}")
-        return jsonify({'error': str(e)}), 500
+        db.session.rollback()
+        return {'error': str(e)}, 500
+
+
+@app.route('/api/v1/growth-path/generate/stream', methods=['GET', 'POST'])
+def stream_growth_path():
+    """Generate a growth path and push each month to the client over server-sent events"""
+    # EventSource can only issue GETs, so parameters may come from the query string
+    data = request.get_json(silent=True) or request.args
+    user_id = data.get('user_id')
+    timeline_months = int(data.get('timeline_months', 12))
+
+    if not user_id:
+        return jsonify({'error': 'user_id is required'}), 400
+    user_id = int(user_id)
+
+    user = User.query.get(user_id)
+    profile = StudentProfile.query.filter_by(user_id=user_id).first()
+
+    if not user or not profile:
+        return jsonify({'error': 'User or profile not found'}), 404
+
+    if not gemini_service:
+        return jsonify({'error': 'Gemini service not available'}), 503
+
+    profile_data = get_profile_generation_data(profile)
+    analysis = profile.get_analysis()
+    # Same flight as /growth-path/generate: a double submit, or a POST racing
+    # this stream, waits for the generation in progress instead of starting
+    # a second one that deletes the first one's trackers
+    flight_key = make_flight_key(user_id, 'growth_path', {'timeline_months': timeline_months})
+    phase_queue = queue.Queue()
+    outcome = {'result': ({'error': 'Roadmap generation failed'}, 500)}
+
+    def generate():
+        # Runs in its own thread so the flight can block while phases are streamed out
+        with app.app_context():
+            try:
+                outcome['result'] = endpoint_flight.do(
+                    flight_key,
+                    lambda: stream_and_save_growth_path(user_id, profile_data, analysis, timeline_months, phase_queue.put)
+                )
+            except Exception as e:
+                print(f"Error streaming growth path: {e}")
+                outcome['result'] = ({'error': str(e)}, 500)
+            finally:
+                phase_queue.put(None)
+
+    def events():
+        # A copy of this request's context, so the flight's model calls count for its rate-limit charge
+        threading.Thread(target=contextvars.copy_context().run, args=(generate,),
+                         name=f'growth-path-stream-{user_id}', daemon=True).start()
+        yield sse_event('started', {'timeline_months': timeline_months})
+        # A request that joined another generation receives no phases, only its result
+        for phase in iter(phase_queue.get, None):
+            yield sse_event('phase', phase)
+
+        payload, status_code = outcome['result']
+        if status_code >= 400:
+            yield sse_event('error', payload)
+        else:
+            yield sse_event('complete', payload)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def stream_and_save_growth_path(user_id, profile_data, analysis, timeline_months, on_phase):
+    """Stream a new growth path, saving each month and passing it to on_phase; returns (payload, status)"""
+    growth_path = None
+    try:
+        for phase in gemini_service.stream_growth_path(profile_data, analysis, timeline_months=timeline_months):
+            if growth_path is None:
+                # Replace the previous roadmap only once the new one has its first
+                # month, in the same transaction, so a failed stream keeps it
+                GrowthPath.query.filter_by(user_id=user_id).update({'is_active': False})
+                ProgressTracker.query.filter_by(user_id=user_id).delete()
+                invalidate_staged_months(user_id, consumed=True)
+                growth_path = GrowthPath(user_id=user_id, phase=1, is_active=True)
+                db.session.add(growth_path)
+            added = growth_path.append_phases([phase])
+            if not added:
+                continue
+            materialize_roadmap(user_id, added)
+            db.session.commit()
+            on_phase(phase)
+    except Exception as e:
+        print(f"Error saving streamed growth path: {e}")
+        db.session.rollback()
+        return {'error': 'Roadmap generation failed'}, 500
+
+    if growth_path is None:
+        return {'error': 'Roadmap generation failed'}, 500
+
+    return {
+        'message': 'Growth path generated successfully',
+        'growth_path': growth_path.to_dict()
+    }, 201
+
+
+def sse_event(event, payload):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
 
 
 @app.route('/api/v1/growth-path/<int:user_id>', methods=['GET'])
@@ -382,7 +512,8 @@ def get_growth_path(user_id):
     progress_items = ProgressTracker.query.filter_by(user_id=user_id).all()
     progress_dict = {p.item_id: p.to_dict() for p in progress_items}
 
-    roadmap = growth_path.get_roadmap()
+    growth_path_dict = growth_path.to_dict()
+    roadmap = copy.deepcopy(growth_path_dict['roadmap'])
 
     # Enrich roadmap with progress data
     for phase in roadmap.get('phases', []):
@@ -392,7 +523,7 @@ def get_growth_path(user_id):
                 item['progress'] = progress_dict.get(item_id, {'status': 'not_started'})
 
     return jsonify({
-        'growth_path': growth_path.to_dict(),
+        'growth_path': growth_path_dict,
         'enriched_roadmap': roadmap
     }), 200
 
@@ -423,136 +554,89 @@ def update_progress():
     if not tracker:
         return jsonify({'error': 'Progress tracker not found'}), 404
 
+    # Generate encouragement if completed. This happens before any writes so
+    # the wait for the shared encouragement batch doesn't hold the database
+    # write lock. Past the deadline the message is provisional and backfilled.
+    encouragement = None
+    if status == 'completed' and gemini_service:
+        user_context = get_user_context(user_id)
+        if tracker.status != 'completed':
+            user_context['completed_count'] += 1
+        encouragement = run_with_deadline(
+            'progress_encouragement',
+            gemini_service.generate_encouragement,
+            {'item_name': tracker.item_name, 'item_type': tracker.item_type},
+            user_context,
+            use_fallback=False
+        )
+
     tracker.status = status
     tracker.notes = notes
 
     next_month_unlocked = False
+    jobs = []
 
-    # Generate encouragement if completed
     if status == 'completed' and gemini_service:
         tracker.completion_date = datetime.utcnow()
-
-        try:
-            user_context = get_user_context(user_id)
-            encouragement = gemini_service.generate_encouragement(
-                completed_item={
-                    'item_name': tracker.item_name,
-                    'item_type': tracker.item_type
-                },
-                user_context=user_context
-            )
-            tracker.encouragement_message = encouragement
-        except Exception as e:
-            print(f"Error generating encouragement: {e}")
-            tracker.encouragement_message = f"Great job completing {tracker.item_name}!"
+        tracker.encouragement_message = encouragement or f"Great job completing {tracker.item_name}!"
+        tracker.encouragement_provisional = encouragement is None
+        if encouragement is None:
+            jobs.append(enqueue_job('backfill_encouragement', user_id=user_id, payload={'tracker_id': tracker.id},
+                                    dedupe_key=f"backfill_encouragement:{tracker.id}", delay_seconds=BACKFILL_DELAY_SECONDS))
 
         # Check if 75%+ of current month's tasks are complete
         # Check if 75%+ of current month's tasks are complete
         growth_path = GrowthPath.query.filter_by(user_id=user_id, is_active=True).first()
         if growth_path:
             current_month = growth_path.current_month
-            month_tasks = ProgressTracker.query.filter_by(user_id=user_id, phase=current_month).all()
-            
-            if month_tasks:
-                completed_count = len([t for t in month_tasks if t.status == 'completed'])
-                total_month_tasks = len(month_tasks)
-                completion_rate = completed_count / total_month_tasks if total_month_tasks > 0 else 0
-                
+            # Counted in the database; autoflush includes this tracker's new status
+            completion_rate = month_completion_rate(user_id, current_month)
+
+            if completion_rate > 0:
+                max_phase = growth_path.max_phase()
+
+                # Halfway through the month: pre-generate the next one in the background
+                if MONTH_PREGENERATE_THRESHOLD and completion_rate >= MONTH_PREGENERATE_THRESHOLD \
+                        and current_month < max_phase and roadmap_assistant:
+                    staging_job = stage_next_month(growth_path, current_month + 1)
+                    if staging_job:
+                        jobs.append(staging_job)
+
                 if completion_rate >= 0.75:
                     # Check if we need to unlock the next month
-                    roadmap = growth_path.get_roadmap()
-                    phases = roadmap.get('phases', [])
-                    max_phase = max([p.get('phase', 0) for p in phases]) if phases else 0
-                    
                     if current_month < max_phase:
                          # Unlock next month
                         growth_path.current_month += 1
                         next_month_unlocked = True
-                    else:
-                        # We are at the end of the current roadmap. Generate next year.
-                        next_start_month = max_phase + 1
-                        
-                        # Fetch profile for generation
-                        profile = StudentProfile.query.filter_by(user_id=user_id).first()
-                        if profile and gemini_service:
-                            try:
-                                print(f"Generating next year starting from month {next_start_month}")
-                                new_roadmap_chunk = gemini_service.generate_growth_path(
-                                    profile_data={
-                                        'major': profile.major,
-                                        'university': profile.university,
-                                        'career_aspirations': profile.career_aspirations,
-                                        'experience_level': profile.experience_level,
-                                        'target_industries': profile.get_target_industries(),
-                                        'current_skills': profile.get_skills(),
-                                        'preferred_content_types': profile.get_preferred_content_types(),
-                                        'time_commitment': profile.time_commitment
-                                    },
-                                    analysis=profile.get_analysis(),
-                                    timeline_months=12,
-                                    start_month=next_start_month
-                                )
-                                
-                                # Append new phases
-                                new_phases = new_roadmap_chunk.get('phases', [])
-                                if new_phases:
-                                    if 'phases' not in roadmap:
-                                        roadmap['phases'] = []
-                                    roadmap['phases'].extend(new_phases)
-                                    growth_path.set_roadmap(roadmap)
-                                    
-                                    # Create progress trackers for new items
-                                    for phase in new_phases:
-                                        create_trackers_for_phase(user_id, phase)
-                                    
-                                    # Unlock the first month of the new year
-                                    growth_path.current_month += 1
-                                    next_month_unlocked = True
-                                    
-                                    db.session.commit()
-                            except Exception as e:
-                                print(f"Error extending roadmap: {e}")
+                        serve_staged_month_on_unlock(growth_path)
+                    # At the end of the roadmap the user stays on the last month; the
+                    # roadmap extender adds the next months ahead of time (see extend_roadmap)
 
-    db.session.commit()
+    # Resume bullets for the completed item are written by a background job
+    if status == 'completed' and gemini_service:
+        jobs.append(enqueue_job(
+            'update_professional_profile',
+            user_id=user_id,
+            payload={'tracker_id': tracker.id}
+        ))
 
-    # Trigger profile update if completed
-    if status == 'completed':
-        try:
-            update_professional_profile(user_id, tracker)
-        except Exception as e:
-            print(f"Error updating professional profile: {e}")
+    db.session.commit()
 
     return jsonify({
         'message': 'Progress updated successfully',
         'progress': tracker.to_dict(),
-        'next_month_unlocked': next_month_unlocked
+        'next_month_unlocked': next_month_unlocked,
+        'jobs': [{'id': job.id, 'job_type': job.job_type} for job in jobs]
     }), 200
 
 
 @app.route('/api/v1/progress/<int:user_id>/summary', methods=['GET'])
 def get_progress_summary(user_id):
     """Get progress summary"""
-    all_items = ProgressTracker.query.filter_by(user_id=user_id).all()
-
     growth_path = GrowthPath.query.filter_by(user_id=user_id, is_active=True).first()
-    current_month = growth_path.current_month if growth_path else 1
-
-    summary = {
-        'total': len(all_items),
-        'not_started': len([i for i in all_items if i.status == 'not_started']),
-        'in_progress': len([i for i in all_items if i.status == 'in_progress']),
-        'completed': len([i for i in all_items if i.status == 'completed']),
-        'current_month': current_month,
-        'by_type': {}
-    }
 
-    # Group by type
-    for item_type in ['course', 'test', 'internship', 'certificate', 'project']:
-        type_items = [i for i in all_items if i.item_type == item_type]
-        summary['by_type'][item_type] = {
-            'total': len(type_items),
-            'completed': len([i for i in type_items if i.status == 'completed'])
-        }
+    summary = progress_summary(user_id)
+    summary['current_month'] = growth_path.current_month if growth_path else 1
 
     return jsonify(summary), 200
 
@@ -589,14 +673,14 @@ def generate_linkedin_post():
 
     try:
         user_context = get_user_context(user_id)
-        post_data = gemini_service.generate_task_linkedin_post(
+        post_data = run_llm(async_gemini_service.generate_task_linkedin_post(
             task_data={
                 'item_name': tracker.item_name,
                 'item_type': tracker.item_type,
                 'notes': tracker.notes
             },
             user_context=user_context
-        )
+        ))
         return jsonify(post_data), 200
     except Exception as e:
         print(f"Error generating LinkedIn post: {e}")
@@ -631,6 +715,31 @@ def toggle_resume_item():
 # INTERACTIVE ROADMAP ASSISTANT ENDPOINTS
 # ============================================================================
 
+def apply_chat_action(preferences, action, message, direction=None):
+    """Apply a chat action to the user's preferences; direction is inferred from the message if not given"""
+    text = message.lower()
+    if action == 'adjust_projects':
+        if direction is None:
+            if 'increase' in text or 'more project' in text:
+                direction = 'increase'
+            elif 'decrease' in text or 'more course' in text:
+                direction = 'decrease'
+        # Increase/decrease project ratio
+        if direction == 'increase':
+            preferences.project_ratio = min(100, preferences.project_ratio + 20)
+        elif direction == 'decrease':
+            preferences.project_ratio = max(0, preferences.project_ratio - 20)
+    elif action == 'adjust_pace':
+        if direction is None:
+            if 'slow' in text or 'relax' in text:
+                direction = 'relaxed'
+            elif 'fast' in text or 'intensive' in text:
+                direction = 'intensive'
+            else:
+                direction = 'moderate'
+        preferences.pace = direction
+
+
 @app.route('/api/v1/roadmap/chat', methods=['POST'])
 def roadmap_chat():
     """Chat with the AI roadmap assistant"""
@@ -652,6 +761,31 @@ def roadmap_chat():
     if not profile:
         return jsonify({'error': 'Profile not found'}), 404
 
+    # Get user preferences
+    preferences = UserPreferences.query.filter_by(user_id=user_id).first()
+    if not preferences:
+        preferences = UserPreferences(user_id=user_id)
+        db.session.add(preferences)
+        db.session.commit()
+
+    # Plain preference changes are applied directly, without a model round trip
+    intent = classify_intent(message)
+    if intent:
+        apply_chat_action(preferences, intent['action'], message, intent['direction'])
+        reply = templated_reply(intent, preferences.to_dict())
+        db.session.add(RoadmapConversation(user_id=user_id, role='user', message=message))
+        db.session.add(RoadmapConversation(user_id=user_id, role='assistant', message=reply))
+        if intent['action'] in ('adjust_projects', 'adjust_pace'):
+            invalidate_staged_months(user_id)
+        db.session.commit()
+        chat_routes.inc(intent=intent['action'], route='local')
+        return jsonify({
+            'response': reply,
+            'action': intent['action'],
+            'preferences': preferences.to_dict(),
+            'encouragement_score': 5
+        }), 200
+
     current_month = growth_path.current_month if growth_path else 1
 
     # Get current month's tasks
@@ -660,29 +794,11 @@ def roadmap_chat():
         phase=current_month
     ).all()
 
-    # Get last 5 conversations
-    recent_conversations = RoadmapConversation.query.filter_by(
-        user_id=user_id
-    ).order_by(RoadmapConversation.created_at.desc()).limit(5).all()
-    conversation_history = [c.to_dict() for c in reversed(recent_conversations)]
+    # Rolling summary of older turns plus recent turns within the token budget
+    memory = load_chat_memory(user_id)
 
-    # Get user preferences
-    preferences = UserPreferences.query.filter_by(user_id=user_id).first()
-    if not preferences:
-        preferences = UserPreferences(user_id=user_id)
-        db.session.add(preferences)
-        db.session.commit()
-
-    # Get completed phases summary
-    completed_phases = []
-    if current_month > 1:
-        for month in range(1, current_month):
-            month_tasks = ProgressTracker.query.filter_by(user_id=user_id, phase=month).all()
-            completed_count = len([t for t in month_tasks if t.status == 'completed'])
-            completed_phases.append({
-                'month': month,
-                'summary': f"Completed {completed_count}/{len(month_tasks)} tasks"
-            })
+    # Get completed phases summary (older months collapsed into one line)
+    completed_phases = get_progress_overview(user_id, current_month)
 
     # Build context
     context = {
@@ -694,12 +810,13 @@ def roadmap_chat():
         'current_month': current_month,
         'current_tasks': [t.to_dict() for t in current_tasks],
         'preferences': preferences.to_dict(),
-        'conversation_history': conversation_history,
+        'conversation_history': memory['recent'],
+        'conversation_summary': memory['summary'],
         'completed_phases': completed_phases
     }
 
     # Get AI response
-    response = roadmap_assistant.chat(message, context)
+    response = run_llm(async_roadmap_assistant.chat(message, context))
 
     # Save conversation
     user_msg = RoadmapConversation(user_id=user_id, role='user', message=message)
@@ -709,20 +826,15 @@ def roadmap_chat():
 
     # Handle actions
     action = response.get('action', 'none')
-    if action == 'adjust_projects':
-        # Increase/decrease project ratio
-        details = response.get('action_details', {})
-        if 'increase' in message.lower() or 'more project' in message.lower():
-            preferences.project_ratio = min(100, preferences.project_ratio + 20)
-        elif 'decrease' in message.lower() or 'more course' in message.lower():
-            preferences.project_ratio = max(0, preferences.project_ratio - 20)
-    elif action == 'adjust_pace':
-        if 'slow' in message.lower() or 'relax' in message.lower():
-            preferences.pace = 'relaxed'
-        elif 'fast' in message.lower() or 'intensive' in message.lower():
-            preferences.pace = 'intensive'
-        else:
-            preferences.pace = 'moderate'
+    apply_chat_action(preferences, action, message)
+    chat_routes.inc(intent=action, route='model')
+
+    if action in ('adjust_projects', 'adjust_pace'):
+        invalidate_staged_months(user_id)
+
+    # Older turns no longer fit the window: fold them into the summary off the request path
+    if memory['needs_fold']:
+        enqueue_job('summarize_conversation', user_id=user_id, dedupe_key=f"summarize_conversation:{user_id}")
 
     db.session.commit()
 
@@ -752,13 +864,7 @@ def get_current_month(user_id):
     preferences = UserPreferences.query.filter_by(user_id=user_id).first()
 
     # Get roadmap data for this month's title/focus
-    month_info = {}
-    if growth_path:
-        roadmap = growth_path.get_roadmap()
-        for phase in roadmap.get('phases', []):
-            if phase.get('phase') == current_month:
-                month_info = phase
-                break
+    month_info = (growth_path.get_phase(current_month) if growth_path else None) or {}
 
     return jsonify({
         'current_month': current_month,
@@ -795,55 +901,88 @@ def generate_current_month():
         db.session.commit()
 
     current_month = growth_path.current_month if growth_path else 1
+    preferences_data = preferences.to_dict()
+
+    # Serve a month pre-generated with the same preferences without a model call
+    staged = take_staged_month(user_id, current_month, preferences_data, growth_path.id if growth_path else None)
+    if staged:
+        apply_month_plan(user_id, current_month, staged)
+        db.session.commit()
+        return jsonify(month_payload(user_id, current_month, staged)), 201
 
     # Get completed phases
-    completed_phases = []
-    if current_month > 1:
-        for month in range(1, current_month):
-            month_tasks = ProgressTracker.query.filter_by(user_id=user_id, phase=month).all()
-            completed_count = len([t for t in month_tasks if t.status == 'completed'])
-            completed_phases.append({
-                'month': month,
-                'summary': f"Completed {completed_count}/{len(month_tasks)} tasks"
-            })
+    completed_phases = get_completed_phases(user_id, current_month)
 
     # Generate new month
-    profile_data = {
-        'major': profile.major,
-        'career_aspirations': profile.career_aspirations,
-        'current_skills': profile.get_skills()
-    }
+    profile_data = get_month_profile_data(profile)
+    flight_key = make_flight_key(user_id, 'generate_month', {
+        'month': current_month,
+        'project_ratio': preferences_data['project_ratio'],
+        'pace': preferences_data['pace'],
+        'focus_areas': preferences_data['focus_areas']
+    })
+    payload = endpoint_flight.do(
+        flight_key,
+        lambda: build_month(user_id, current_month, profile_data, preferences_data, completed_phases)
+    )
+    return jsonify(payload), 201
 
-    month_data = roadmap_assistant.generate_single_month(
+
+def build_month(user_id, current_month, profile_data, preferences_data, completed_phases):
+    """Generate a single month and replace its trackers, returns the response payload"""
+    month_data = run_llm(async_roadmap_assistant.generate_single_month(
         profile=profile_data,
         month_number=current_month,
-        preferences=preferences.to_dict(),
+        preferences=preferences_data,
         completed_phases=completed_phases
-    )
+    ))
+
+    apply_month_plan(user_id, current_month, month_data)
+    db.session.commit()
 
+    return month_payload(user_id, current_month, month_data)
+
+
+def apply_month_plan(user_id, month, month_data):
+    """Replace a month's trackers with the tasks of a generated month plan"""
     # Clear existing tasks for this month (if regenerating)
-    ProgressTracker.query.filter_by(user_id=user_id, phase=current_month).delete()
+    ProgressTracker.query.filter_by(user_id=user_id, phase=month).delete()
 
     # Create new tasks
-    for task in month_data.get('tasks', []):
-        tracker = ProgressTracker(
-            user_id=user_id,
-            item_id=task['id'],
-            item_type=task['type'],
-            item_name=task['name'],
-            status='not_started',
-            phase=current_month,
-            notes=task.get('description', '')
-        )
-        db.session.add(tracker)
+    insert_trackers(month_plan_tracker_rows(user_id, month, month_data))
 
-    db.session.commit()
 
-    return jsonify({
-        'month': current_month,
+def month_payload(user_id, month, month_data):
+    return {
+        'month': month,
         'month_data': month_data,
-        'tasks': [t.to_dict() for t in ProgressTracker.query.filter_by(user_id=user_id, phase=current_month).all()]
-    }), 201
+        'tasks': [t.to_dict() for t in ProgressTracker.query.filter_by(user_id=user_id, phase=month).all()]
+    }
+
+
+def take_staged_month(user_id, month, preferences_data, growth_path_id):
+    """Claim a staged month plan if it was generated for this roadmap with the current preferences"""
+    staged = StagedMonth.query.filter_by(user_id=user_id, month=month, status='ready').first()
+    if not staged:
+        return None
+    if staged.growth_path_id != growth_path_id or \
+            staged.preferences_key != get_preferences_key(user_id, preferences_data):
+        db.session.delete(staged)
+        staged_month_events.inc(event='stale')
+        return None
+    staged.status = 'consumed'
+    staged_month_events.inc(event='served')
+    return staged.get_month_data()
+
+
+def invalidate_staged_months(user_id, consumed=False):
+    """Drop unused staged months (caller commits); consumed=True also drops used ones when the roadmap is replaced"""
+    query = StagedMonth.query.filter_by(user_id=user_id)
+    if not consumed:
+        query = query.filter_by(status='ready')
+    dropped = query.delete()
+    if dropped:
+        staged_month_events.inc(dropped, event='invalidated')
 
 
 @app.route('/api/v1/roadmap/preferences', methods=['POST'])
@@ -867,6 +1006,7 @@ def update_preferences():
     if 'focus_areas' in data:
         preferences.set_focus_areas(data['focus_areas'])
 
+    invalidate_staged_months(user_id)
     db.session.commit()
 
     return jsonify({
@@ -886,8 +1026,7 @@ def update_professional_profile(user_id, completed_item):
 
     profile_entry = ProfessionalProfile.query.filter_by(user_id=user_id).first()
     if not profile_entry:
-        profile_entry = ProfessionalProfile(user_id=user_id)
-        db.session.add(profile_entry)
+        profile_entry = add_professional_profile(user_id)
 
     current_resume = profile_entry.get_resume()
 
@@ -996,21 +1135,27 @@ def get_linkedin_suggestions(user_id):
     profile = ProfessionalProfile.query.filter_by(user_id=user_id).first()
 
     if not profile:
-        # Generate fresh suggestions
+        # Generate fresh suggestions. Past the deadline an empty placeholder is
+        # saved as provisional and filled in by a backfill job.
         if gemini_service:
-            try:
-                user_context = get_user_context(user_id)
-                linkedin_content = gemini_service.generate_linkedin_content(user_context)
-
-                # Save suggestions
-                profile = ProfessionalProfile(user_id=user_id)
-                profile.set_linkedin(linkedin_content)
-                db.session.add(profile)
-                db.session.commit()
+            user_context = get_user_context(user_id)
+            linkedin_content = run_with_deadline('linkedin_content', gemini_service.generate_linkedin_content,
+                                                 user_context, use_fallback=False)
+
+            # Save suggestions
+            profile = add_professional_profile(user_id)
+            profile.linkedin_provisional = linkedin_content is None
+            profile.set_linkedin(linkedin_content or {
+                'post_ideas': [],
+                'profile_summary': '',
+                'skills_to_add': []
+            })
+            if profile.linkedin_provisional:
+                enqueue_job('backfill_linkedin_content', user_id=user_id, dedupe_key=f"backfill_linkedin_content:{user_id}",
+                            delay_seconds=BACKFILL_DELAY_SECONDS)
+            db.session.commit()
 
-                return jsonify(linkedin_content), 200
-            except Exception as e:
-                print(f"Error generating LinkedIn content: {e}")
+            return jsonify(dict(profile.get_linkedin(), provisional=profile.linkedin_provisional)), 200
 
         return jsonify({
             'post_ideas': [],
@@ -1018,7 +1163,7 @@ def get_linkedin_suggestions(user_id):
             'skills_to_add': []
         }), 200
 
-    return jsonify(profile.get_linkedin()), 200
+    return jsonify(dict(profile.get_linkedin(), provisional=bool(profile.linkedin_provisional))), 200
 
 
 @app.route('/api/v1/profile/refresh', methods=['POST'])
@@ -1039,10 +1184,10 @@ def refresh_profile():
 
         profile = ProfessionalProfile.query.filter_by(user_id=user_id).first()
         if not profile:
-            profile = ProfessionalProfile(user_id=user_id)
-            db.session.add(profile)
+            profile = add_professional_profile(user_id)
 
         profile.set_linkedin(linkedin_content)
+        profile.linkedin_provisional = False
         profile.last_generated = datetime.utcnow()
         db.session.commit()
 
@@ -1063,13 +1208,45 @@ def refresh_profile():
 @app.route('/api/v1/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    circuits = breaker_states()
     return jsonify({
-        'status': 'healthy',
+        'status': 'degraded' if any(c['state'] != 'closed' for c in circuits.values()) else 'healthy',
         'gemini_available': gemini_service is not None,
+        'llm_backend': get_backend_name(),
+        'llm_circuits': circuits,
         'database': 'connected'
     }), 200
 
 
+@app.route('/api/v1/cache/stats', methods=['GET'])
+def cache_stats():
+    """Response cache, single-flight and structured-output parse counters"""
+    return jsonify({
+        'llm_cache': get_response_cache().stats(),
+        'single_flight': {
+            'llm': llm_flight.stats(),
+            'llm_async': async_llm_flight.stats(),
+            'endpoints': endpoint_flight.stats()
+        },
+        'structured_output': parse_stats()
+    }), 200
+
+
+@app.route('/api/v1/llm/routes', methods=['GET'])
+def llm_routes():
+    """Model tier, latency budget and current routing per operation"""
+    return jsonify({
+        'tiers': dict(get_model_router().tiers),
+        'routes': get_model_router().snapshot()
+    }), 200
+
+
+@app.route('/api/v1/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of model call, cache and HTTP metrics"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/v1/test', methods=['GET', 'POST'])
 def test_endpoint():
     """Test endpoint to verify connectivity"""
@@ -1113,25 +1290,352 @@ def root():
     return send_from_directory(app.static_folder, 'index.html')
 
 
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+@job_handler('update_professional_profile')
+def update_professional_profile_job(payload, user_id):
+    """Write resume bullets for a completed task"""
+    tracker = db.session.get(ProgressTracker, payload['tracker_id'])
+    if not tracker or tracker.status != 'completed':
+        return {'skipped': True}
+    update_professional_profile(user_id, tracker)
+    return {'tracker_id': tracker.id}
+
+
+@job_handler('backfill_profile_analysis')
+def backfill_profile_analysis_job(payload, user_id):
+    """Replace a provisional profile analysis with the model's"""
+    profile = StudentProfile.query.filter_by(user_id=user_id).first()
+    if not profile or not profile.analysis_provisional or not gemini_service:
+        return {'skipped': True}
+    analysis = gemini_service.analyze_student_profile(get_analysis_input(profile), use_fallback=False)
+    if not analysis:
+        raise RuntimeError("profile analysis still unavailable")
+    profile.set_analysis(analysis)
+    profile.analysis_provisional = False
+    backfills.inc(endpoint='onboard_analysis')
+    return {'backfilled': True}
+
+
+@job_handler('backfill_encouragement')
+def backfill_encouragement_job(payload, user_id):
+    """Replace a provisional encouragement message with the model's"""
+    tracker = db.session.get(ProgressTracker, payload['tracker_id'])
+    if not tracker or not tracker.encouragement_provisional or not gemini_service:
+        return {'skipped': True}
+    message = gemini_service.generate_encouragement(
+        {'item_name': tracker.item_name, 'item_type': tracker.item_type},
+        get_user_context(user_id),
+        use_fallback=False
+    )
+    if not message:
+        raise RuntimeError("encouragement still unavailable")
+    tracker.encouragement_message = message
+    tracker.encouragement_provisional = False
+    backfills.inc(endpoint='progress_encouragement')
+    return {'tracker_id': tracker.id}
+
+
+@job_handler('backfill_linkedin_content')
+def backfill_linkedin_content_job(payload, user_id):
+    """Replace provisional LinkedIn suggestions with the model's"""
+    profile = ProfessionalProfile.query.filter_by(user_id=user_id).first()
+    if not profile or not profile.linkedin_provisional or not gemini_service:
+        return {'skipped': True}
+    linkedin_content = gemini_service.generate_linkedin_content(get_user_context(user_id), use_fallback=False)
+    if not linkedin_content:
+        raise RuntimeError("LinkedIn content still unavailable")
+    profile.set_linkedin(linkedin_content)
+    profile.linkedin_provisional = False
+    profile.last_generated = datetime.utcnow()
+    backfills.inc(endpoint='linkedin_content')
+    return {'backfilled': True}
+
+
+@job_handler('summarize_conversation')
+def summarize_conversation_job(payload, user_id):
+    """Fold chat turns that fell out of the recent window into the user's summary"""
+    if not roadmap_assistant:
+        return {'skipped': True}
+    return {'folded': fold_conversation(user_id, roadmap_assistant.summarize_conversation)}
+
+
+def extend_roadmap(growth_path_id, ahead_months, months=12):
+    """Append generated months to a roadmap nearing its end; returns phases added"""
+    growth_path = db.session.get(GrowthPath, growth_path_id)
+    if not growth_path or not growth_path.is_active or not gemini_service:
+        return 0
+
+    max_phase = growth_path.max_phase()
+    if max_phase - growth_path.current_month > ahead_months:
+        # Already extended since it was found due
+        return 0
+
+    profile = StudentProfile.query.filter_by(user_id=growth_path.user_id).first()
+    if not profile:
+        return 0
+
+    start_month = max_phase + 1
+    print(f"Generating next year starting from month {start_month}")
+    new_roadmap_chunk = gemini_service.generate_growth_path_fanout(
+        profile_data=get_profile_generation_data(profile),
+        analysis=profile.get_analysis(),
+        timeline_months=months,
+        start_month=start_month
+    )
+    new_phases = new_roadmap_chunk.get('phases', [])
+    if len(new_phases) != months:
+        raise RuntimeError(f"{len(new_phases)} of {months} phases generated for months {start_month}-{start_month + months - 1}")
+
+    # Re-read before writing: the user may have advanced while the model was
+    # working, and a concurrent run may already have appended these months
+    db.session.refresh(growth_path)
+    if growth_path.max_phase() >= start_month:
+        return 0
+    new_phases = growth_path.append_phases(new_phases)
+    materialize_roadmap(growth_path.user_id, new_phases)
+
+    # A user who already finished the old last month moves straight on
+    if growth_path.current_month == max_phase and month_completion_rate(growth_path.user_id, max_phase) >= 0.75:
+        growth_path.current_month = start_month
+    db.session.commit()
+    return len(new_phases)
+
+
+# Completion rate at which the next month is generated ahead of unlock (0 disables)
+MONTH_PREGENERATE_THRESHOLD = float(os.getenv('MONTH_PREGENERATE_THRESHOLD', '0.5'))
+
+staged_month_events = registry.counter(
+    'staged_month_events_total', 'Speculatively generated months: staged, served, stale, invalidated, discarded',
+    ('event',))
+
+
+def stage_next_month(growth_path, month):
+    """Enqueue pre-generation of a month of the roadmap unless it is already staged or queued (caller commits)"""
+    user_id = growth_path.user_id
+    staged = StagedMonth.query.filter_by(user_id=user_id, month=month).first()
+    if staged and staged.growth_path_id == growth_path.id:
+        return None
+    if staged:
+        # Left over from a roadmap that has since been replaced
+        db.session.delete(staged)
+        staged_month_events.inc(event='stale')
+    return enqueue_job(
+        'stage_month',
+        user_id=user_id,
+        payload={'month': month, 'growth_path_id': growth_path.id},
+        dedupe_key=f"stage_month:{user_id}:{month}",
+        max_attempts=2
+    )
+
+
+def serve_staged_month_on_unlock(growth_path):
+    """Swap in a staged plan for a newly unlocked month the user hasn't started (caller commits)"""
+    user_id, month = growth_path.user_id, growth_path.current_month
+    preferences = UserPreferences.query.filter_by(user_id=user_id).first()
+    if not preferences:
+        return
+    started = ProgressTracker.query.filter(
+        ProgressTracker.user_id == user_id,
+        ProgressTracker.phase == month,
+        ProgressTracker.status != 'not_started'
+    ).first()
+    if started:
+        return
+    staged = take_staged_month(user_id, month, preferences.to_dict(), growth_path.id)
+    if staged:
+        apply_month_plan(user_id, month, staged)
+
+
+@job_handler('stage_month')
+def stage_month_job(payload, user_id):
+    """Generate a month plan ahead of unlock with the user's current preferences"""
+    month = payload['month']
+    growth_path = db.session.get(GrowthPath, payload.get('growth_path_id') or 0)
+    profile = StudentProfile.query.filter_by(user_id=user_id).first()
+    preferences = UserPreferences.query.filter_by(user_id=user_id).first()
+    if not profile or not growth_path or not growth_path.is_active or not async_roadmap_assistant:
+        return {'skipped': True}
+    if not preferences:
+        preferences = UserPreferences(user_id=user_id)
+        db.session.add(preferences)
+        db.session.commit()
+
+    preferences_data = preferences.to_dict()
+    month_data = run_llm(async_roadmap_assistant.generate_single_month(
+        profile=get_month_profile_data(profile),
+        month_number=month,
+        preferences=preferences_data,
+        completed_phases=get_completed_phases(user_id, month),
+        use_fallback=False
+    ))
+    if not month_data:
+        raise RuntimeError(f"month {month} generation failed")
+
+    # Preferences may have changed (and invalidated staging) or the roadmap may
+    # have been regenerated while the model was working
+    db.session.refresh(preferences)
+    db.session.refresh(growth_path)
+    preferences_key = get_preferences_key(user_id, preferences.to_dict())
+    if preferences_key != get_preferences_key(user_id, preferences_data) or not growth_path.is_active:
+        staged_month_events.inc(event='discarded')
+        return {'discarded': True}
+
+    staged = StagedMonth.query.filter_by(user_id=user_id, month=month).first()
+    if staged:
+        return {'skipped': True}
+    staged = StagedMonth(user_id=user_id, growth_path_id=growth_path.id, month=month, preferences_key=preferences_key)
+    staged.set_month_data(month_data)
+    db.session.add(staged)
+    db.session.commit()
+    staged_month_events.inc(event='staged')
+    return {'staged_month_id': staged.id}
+
+
+@app.route('/api/v1/jobs/<int:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Status and result of a background job"""
+    job = db.session.get(BackgroundJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+job_worker = JobWorker(app)
+roadmap_extender = RoadmapExtender(app, extend_roadmap)
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+llm_cache_events = registry.counter(
+    'llm_cache_events_total', 'Response cache events as reported by the cache', ('method', 'event'))
+single_flight_calls = registry.counter(
+    'single_flight_calls_total', 'Single-flight leaders and coalesced followers', ('scope', 'role'))
+single_flight_in_flight = registry.gauge(
+    'single_flight_in_flight', 'Keys currently being computed', ('scope',))
+background_jobs = registry.gauge(
+    'background_jobs', 'Background jobs by type and status', ('job_type', 'status'))
+structured_parse_outcomes = registry.counter(
+    'structured_output_parse_total', 'Structured output parse outcomes', ('method', 'outcome'))
+
+
+@registry.collector
+def collect_subsystem_stats():
+    """Copy the cache, single-flight and parse counters into the registry at scrape time"""
+    for method, events in get_response_cache().stats().items():
+        for event, count in events.items():
+            llm_cache_events.set_total(count, method=method, event=event)
+
+    for scope, flight in (('llm', llm_flight), ('llm_async', async_llm_flight), ('endpoints', endpoint_flight)):
+        stats = flight.stats()
+        for role in ('leaders', 'followers'):
+            single_flight_calls.set_total(stats[role], scope=scope, role=role)
+        single_flight_in_flight.set(stats['in_flight'], scope=scope)
+
+    for method, outcomes in parse_stats().items():
+        for outcome, count in outcomes.items():
+            structured_parse_outcomes.set_total(count, method=method, outcome=outcome)
+
+    with app.app_context():
+        for job_type, statuses in job_stats().items():
+            for status, count in statuses.items():
+                background_jobs.set(count, job_type=job_type, status=status)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Route template rather than the raw path, so user ids don't explode the label set
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, route=route,
+                                     method=request.method, status=response.status_code)
+    return response
+
+
+# Model-backed endpoints -> the operation whose estimated tokens they are charged
+RATE_LIMITED_ENDPOINTS = {
+    'onboard_user': 'analyze_student_profile',
+    'generate_growth_path': 'generate_growth_path',
+    'stream_growth_path': 'generate_growth_path',
+    'generate_current_month': 'generate_single_month',
+    'roadmap_chat': 'chat',
+    'generate_linkedin_post': 'generate_task_linkedin_post',
+    'refresh_profile': 'generate_linkedin_content',
+}
+
+
+@app.before_request
+def enforce_rate_limit():
+    """Throttle model-backed endpoints with per-user and global token buckets"""
+    operation = RATE_LIMITED_ENDPOINTS.get(request.endpoint)
+    if operation is None:
+        return None
+    data = request.get_json(silent=True) or request.args
+    user_id = (request.view_args or {}).get('user_id') or data.get('user_id')
+    if not user_id:
+        # The view rejects the request itself
+        return None
+
+    decision = get_rate_limiter().acquire(user_id, operation)
+    if decision['allowed']:
+        g.rate_limit_charge = (user_id, operation, track_model_calls())
+        return None
+    message = 'Too many requests' if decision['scope'] == 'user' else 'Service is busy'
+    response = jsonify({'error': f"{message}, retry in {decision['retry_after']} seconds",
+                        'retry_after': decision['retry_after']})
+    response.headers['Retry-After'] = str(decision['retry_after'])
+    return response, 429
+
+
+@app.teardown_request
+def refund_rate_limit(exc):
+    """Give back the rate-limit charge of a request that never reached the model"""
+    charge = g.pop('rate_limit_charge', None)
+    if charge is None:
+        return
+    stop_tracking_model_calls()
+    user_id, operation, calls = charge
+    if not calls['count']:
+        get_rate_limiter().refund(user_id, operation)
+
+
 # ============================================================================
 # INITIALIZE DATABASE
 # ============================================================================
 
 @app.before_request
 def initialize_database():
-    """Create database tables if they don't exist"""
+    """Bring the database schema up to date with any pending migrations"""
     if not hasattr(app, 'db_initialized'):
         with app.app_context():
-            db.create_all()
+            run_migrations()
         app.db_initialized = True
 
 
+@app.before_request
+def start_job_worker():
+    """Run job workers and the roadmap extender inside the web process unless a separate worker.py handles them"""
+    if os.getenv('JOB_WORKERS_IN_PROCESS', '1') == '1':
+        job_worker.start()
+        roadmap_extender.start()
+
+
 # ============================================================================
 # RUN APP
 # ============================================================================
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        run_migrations()
 
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from metrics import registry
+
+# Collects small, independent requests from many threads over a short window
+# and hands them to a handler as one batch, so per-call overhead (one model
+# round trip) is paid once per batch rather than once per request.
+
+batch_sizes = registry.histogram(
+    'micro_batch_size', 'Requests per dispatched batch', ('batcher',),
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+batch_wait_seconds = registry.histogram(
+    'micro_batch_wait_seconds', 'Time a request waited for its batch to be dispatched', ('batcher',))
+batch_failures = registry.counter(
+    'micro_batch_failures_total', 'Batches whose handler raised', ('batcher',))
+
+
+class MicroBatcher:
+    """
+    handler(items) takes {request_id: item} and returns {request_id: result}.
+    A batch is dispatched once it holds max_items requests or the oldest has
+    waited window seconds. Requests missing from the handler's answer, or in a
+    batch whose handler raised, fail individually so callers can fall back.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 max_items: int = 16, window: float = 0.2, max_in_flight: int = 4):
+        self.name = name
+        self.handler = handler
+        self.max_items = max_items
+        self.window = window
+        self.max_in_flight = max_in_flight
+        self._pending: List[Tuple[Any, Future, float]] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 1 and self.window > 0
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue one request; the returned future resolves to its result
+        """
+        future = Future()
+        if not self.enabled:
+            self._dispatch([(item, future, time.perf_counter())])
+            return future
+
+        with self._cond:
+            self._ensure_thread()
+            self._pending.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def _ensure_thread(self) -> None:
+        # Threads do not survive fork; each Gunicorn worker starts its own
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix=f'{self.name}-batch')
+        self._thread = threading.Thread(target=self._loop, name=f'{self.name}-batcher', daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0][2] + self.window
+                while len(self._pending) < self.max_items:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_items]
+                del self._pending[:self.max_items]
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[Tuple[Any, Future, float]]) -> None:
+        now = time.perf_counter()
+        batch_sizes.observe(len(batch), batcher=self.name)
+        for _, _, queued in batch:
+            batch_wait_seconds.observe(now - queued, batcher=self.name)
+
+        # Request IDs only need to be unique within the batch
+        futures = {}
+        items = {}
+        for index, (item, future, _) in enumerate(batch, start=1):
+            request_id = f"r{index}"
+            items[request_id] = item
+            futures[request_id] = future
+
+        try:
+            results = self.handler(items) or {}
+        except Exception as e:
+            print(f"Error in {self.name} batch of {len(batch)}: {e}")
+            batch_failures.inc(batcher=self.name)
+            for future in futures.values():
+                future.set_exception(e)
+            return
+
+        for request_id, future in futures.items():
+            if request_id in results:
+                future.set_result(results[request_id])
+            else:
+                future.set_exception(KeyError(f"{self.name} batch returned no result for {request_id}"))
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
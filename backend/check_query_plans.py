@@ -0,0 +1,170 @@
+"""
+Checks that the hot per-user queries are served by the indexes from the
+migrations rather than full table scans, at production-sized tables.
+
+A scratch SQLite database is migrated and filled with a sample of synthetic
+rows, ANALYZEd, and its planner statistics are then scaled to --rows tracker
+rows (users grow with rows, tasks per user stay the same). The planner only
+sees those statistics, so the plans are the ones it would pick at that size
+without materializing it; pass --sample-rows equal to --rows to build it for
+real.
+
+    python check_query_plans.py                   # 10M tracker rows
+    python check_query_plans.py --rows 50000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from migrations import run_migrations
+from models import db, GrowthPath, GrowthPathPhase, ProgressAggregate, ProgressTracker, RoadmapConversation, StudentProfile
+from progress_stats import rebuild_aggregates
+
+TASKS_PER_USER = 100
+MONTHS = 24
+STATUSES = ('not_started', 'in_progress', 'completed')
+ITEM_TYPES = ('course', 'test', 'internship', 'certificate', 'project')
+CHUNK = 20000
+
+
+def hot_queries(user_id: int):
+    """
+    (description, statement, index that must serve it), built from the same
+    ORM calls the app makes
+    """
+    growth_path_id = user_id * 2  # populate gives each user an inactive then an active path
+    return [
+        ('month tasks', ProgressTracker.query.filter_by(user_id=user_id, phase=3).statement,
+         'ix_progress_tracker_user_phase'),
+        ('task by item id', ProgressTracker.query.filter_by(user_id=user_id, item_id='course_3_1').statement,
+         'ix_progress_tracker_user_item'),
+        ('completed tasks', ProgressTracker.query.filter_by(user_id=user_id, status='completed').statement,
+         'ix_progress_tracker_user_status'),
+        ('per-month counts', db.session.query(ProgressAggregate.phase, db.func.sum(ProgressAggregate.total),
+                                              db.func.sum(ProgressAggregate.completed))
+         .filter(ProgressAggregate.user_id == user_id, ProgressAggregate.phase < 12)
+         .group_by(ProgressAggregate.phase).statement,
+         'uq_progress_aggregates_user_phase_type'),
+        ('progress summary', ProgressAggregate.query.filter_by(user_id=user_id).statement,
+         'uq_progress_aggregates_user_phase_type'),
+        ('active growth path', GrowthPath.query.filter_by(user_id=user_id, is_active=True).statement,
+         'ix_growth_paths_user_active'),
+        ('roadmap month', GrowthPathPhase.query.filter_by(growth_path_id=growth_path_id, month=3).statement,
+         'uq_growth_path_phases_path_month'),
+        ('roadmap length', db.session.query(db.func.max(GrowthPathPhase.month))
+         .filter(GrowthPathPhase.growth_path_id == growth_path_id).statement,
+         'uq_growth_path_phases_path_month'),
+        ('recent chat', RoadmapConversation.query.filter(
+            RoadmapConversation.user_id == user_id, RoadmapConversation.id > 0
+        ).order_by(RoadmapConversation.id.desc()).limit(20).statement,
+         'ix_roadmap_conversations_user_id_id'),
+        ('student profile', StudentProfile.query.filter_by(user_id=user_id).statement,
+         'uq_student_profiles_user_id'),
+    ]
+
+
+def populate(sample_rows: int) -> int:
+    """
+    Insert sample_rows trackers plus matching aggregates, paths, phases, chats and profiles;
+    returns the number of users
+    """
+    users = max(1, sample_rows // TASKS_PER_USER)
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        conn.execute(StudentProfile.__table__.insert(), [{'user_id': u} for u in range(1, users + 1)])
+        conn.execute(GrowthPath.__table__.insert(), [
+            {'user_id': u, 'phase': 1, 'roadmap_data': '{}', 'is_active': active, 'generated_at': now}
+            for u in range(1, users + 1) for active in (False, True)
+        ])
+        conn.execute(GrowthPathPhase.__table__.insert(), [
+            {'growth_path_id': path_id, 'month': month, 'phase_data': '{}'}
+            for path_id in range(1, 2 * users + 1) for month in range(1, MONTHS + 1)
+        ])
+        rows = []
+        for n in range(sample_rows):
+            user_id = n // TASKS_PER_USER + 1
+            phase = (n % TASKS_PER_USER) * MONTHS // TASKS_PER_USER + 1
+            rows.append({'user_id': user_id, 'item_id': f"{ITEM_TYPES[n % 5]}_{phase}_{n % 4}",
+                         'item_type': ITEM_TYPES[n % 5], 'status': rng.choice(STATUSES), 'phase': phase})
+            if len(rows) == CHUNK:
+                conn.execute(ProgressTracker.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(ProgressTracker.__table__.insert(), rows)
+        rebuild_aggregates(conn)
+        conn.execute(RoadmapConversation.__table__.insert(), [
+            {'user_id': u, 'role': 'user', 'message': 'hi', 'created_at': now + timedelta(seconds=i)}
+            for u in range(1, users + 1) for i in range(10)
+        ])
+    return users
+
+
+def scale_statistics(path: str, sample_users: int, target_rows: int) -> None:
+    """
+    ANALYZE, then scale every table's row count in sqlite_stat1 to the size
+    it would have at target_rows tracker rows
+    """
+    factor = target_rows / (sample_users * TASKS_PER_USER)
+    conn = sqlite3.connect(path)
+    conn.execute('ANALYZE')
+    for tbl, idx, stat in conn.execute('SELECT tbl, idx, stat FROM sqlite_stat1').fetchall():
+        parts = stat.split(' ')
+        parts[0] = str(int(int(parts[0]) * factor))
+        conn.execute('UPDATE sqlite_stat1 SET stat = ? WHERE tbl = ? AND idx IS ?', (' '.join(parts), tbl, idx))
+    conn.commit()
+    conn.close()
+
+
+def explain(path: str, statement) -> list:
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    # A fresh connection loads the scaled statistics
+    conn = sqlite3.connect(path)
+    try:
+        return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()]
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Verify hot queries use their indexes at scale')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='tracker rows the planner should assume')
+    parser.add_argument('--sample-rows', type=int, default=200_000, help='tracker rows actually inserted')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='query-plans-')
+    path = os.path.join(workdir, 'plans.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+
+    with app.app_context():
+        run_migrations()
+        users = populate(args.sample_rows)
+        scale_statistics(path, users, args.rows)
+        print(f"Planner statistics scaled to {args.rows:,} tracker rows "
+              f"({args.sample_rows:,} sampled, scratch db {path})\n")
+
+        queries = hot_queries(user_id=users // 2 or 1)
+        failures = 0
+        for description, statement, index in queries:
+            plan = explain(path, statement)
+            ok = any(index in step for step in plan) and not any(
+                step.startswith('SCAN') and 'INDEX' not in step for step in plan)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {description:20} expects {index}")
+            for step in plan:
+                print(f"       {step}")
+        print(f"\n{failures} of {len(queries)} queries not using their index"
+              if failures else "\nAll hot queries use their indexes")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import os
+from typing import Callable, Dict, List, Optional
+
+from metrics import registry
+from models import db, ConversationMemory, RoadmapConversation
+from progress_stats import phase_counts
+
+# Keeps the chat prompt a fixed size however long a user has been around:
+# recent turns are sent verbatim up to a token budget, everything older is
+# folded (by a background job) into one rolling summary per user, and month
+# history is collapsed to an aggregate plus the last few months.
+
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', '800'))
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv('CHAT_HISTORY_MAX_MESSAGES', '20'))
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv('CHAT_SUMMARY_MAX_CHARS', '1500'))
+CHAT_SUMMARY_FOLD_MESSAGES = int(os.getenv('CHAT_SUMMARY_FOLD_MESSAGES', '40'))
+CHAT_RECENT_MONTHS = int(os.getenv('CHAT_RECENT_MONTHS', '2'))
+# Rough chars-per-token for budgeting; exact counts would need a tokenizer call
+CHARS_PER_TOKEN = 4
+
+chat_history_tokens = registry.histogram(
+    'chat_history_tokens', 'Estimated tokens of summary plus recent turns sent with a chat message',
+    buckets=(50, 100, 200, 400, 800, 1200, 1600, 2400, 3200))
+conversation_folds = registry.counter(
+    'conversation_summary_folds_total', 'Messages folded into rolling conversation summaries')
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text or '') // CHARS_PER_TOKEN)
+
+
+def recent_window(messages: List[Dict], budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> List[Dict]:
+    """
+    Newest messages (given oldest first) that fit in budget tokens, oldest
+    first. The newest message is always kept, truncated if it alone is over.
+    """
+    window = []
+    used = 0
+    for message in reversed(messages):
+        tokens = estimate_tokens(message['message'])
+        if used + tokens > budget:
+            if not window:
+                window.append(dict(message, message=message['message'][:budget * CHARS_PER_TOKEN]))
+            break
+        window.append(message)
+        used += tokens
+    return list(reversed(window))
+
+
+def load_chat_memory(user_id: int) -> Dict:
+    """
+    Summary of older turns plus the token-budgeted recent window.
+    needs_fold is set when unsummarized turns no longer fit the window,
+    by token budget or by CHAT_HISTORY_MAX_MESSAGES.
+    """
+    memory = ConversationMemory.query.filter_by(user_id=user_id).first()
+    summarized_through = memory.summarized_through_id if memory else 0
+    summary = memory.summary if memory else ''
+
+    rows = RoadmapConversation.query.filter(
+        RoadmapConversation.user_id == user_id,
+        RoadmapConversation.id > summarized_through
+    ).order_by(RoadmapConversation.id.desc()).limit(CHAT_HISTORY_MAX_MESSAGES + 1).all()
+    # One row past the limit tells whether older unsummarized turns exist
+    older_unsummarized = len(rows) > CHAT_HISTORY_MAX_MESSAGES
+    messages = [row.to_dict() for row in reversed(rows[:CHAT_HISTORY_MAX_MESSAGES])]
+    window = recent_window(messages)
+
+    chat_history_tokens.observe(estimate_tokens(summary) + sum(estimate_tokens(m['message']) for m in window))
+    return {
+        'summary': summary or '',
+        'recent': window,
+        'needs_fold': older_unsummarized or len(window) < len(messages)
+    }
+
+
+def fold_conversation(user_id: int, summarize: Callable[[str, List[Dict]], Optional[str]]) -> int:
+    """
+    Fold unsummarized turns that have fallen out of the recent window into the
+    user's summary; returns how many were folded. summarize(previous_summary,
+    messages) returns the new summary or None on failure.
+    """
+    memory = ConversationMemory.query.filter_by(user_id=user_id).first()
+    if not memory:
+        memory = ConversationMemory(user_id=user_id, summary='', summarized_through_id=0)
+        db.session.add(memory)
+        db.session.flush()
+
+    rows = RoadmapConversation.query.filter(
+        RoadmapConversation.user_id == user_id,
+        RoadmapConversation.id > memory.summarized_through_id
+    ).order_by(RoadmapConversation.id.asc()).limit(CHAT_SUMMARY_FOLD_MESSAGES).all()
+    if len(rows) < CHAT_SUMMARY_FOLD_MESSAGES:
+        # Everything pending is loaded: keep the newest half-budget (and at most
+        # half the message limit) verbatim, so the next fold is due only after
+        # another half of either of new turns
+        messages = [row.to_dict() for row in rows]
+        kept = recent_window(messages, CHAT_HISTORY_TOKEN_BUDGET // 2)[-max(1, CHAT_HISTORY_MAX_MESSAGES // 2):]
+        rows = rows[:len(rows) - len(kept)]
+    if not rows:
+        db.session.commit()
+        return 0
+
+    summary = summarize(memory.summary or '', [row.to_dict() for row in rows])
+    if not summary:
+        raise RuntimeError(f"conversation summary failed for user {user_id}")
+
+    memory.summary = summary.strip()[:CHAT_SUMMARY_MAX_CHARS]
+    memory.summarized_through_id = rows[-1].id
+    db.session.commit()
+    conversation_folds.inc(len(rows))
+    return len(rows)
+
+
+def get_progress_overview(user_id: int, current_month: int, recent_months: int = CHAT_RECENT_MONTHS) -> List[Dict]:
+    """
+    Completion per previous month in the get_completed_phases format, with
+    all but the last recent_months collapsed into one aggregate entry
+    """
+    if current_month <= 1:
+        return []
+    counts = {phase: (c['total'], c['completed']) for phase, c in phase_counts(user_id, before=current_month).items()}
+
+    first_recent = max(1, current_month - recent_months)
+    overview = []
+    if first_recent > 1:
+        total = sum(counts.get(month, (0, 0))[0] for month in range(1, first_recent))
+        done = sum(counts.get(month, (0, 0))[1] for month in range(1, first_recent))
+        span = '1' if first_recent == 2 else f"1-{first_recent - 1}"
+        overview.append({'month': span, 'summary': f"Completed {done}/{total} tasks"})
+    for month in range(first_recent, current_month):
+        total, done = counts.get(month, (0, 0))
+        overview.append({'month': month, 'summary': f"Completed {done}/{total} tasks"})
+    return overview
@@ -0,0 +1,75 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+from metrics import registry
+from resilience import call_deadline
+
+# Latency ceilings for endpoints that wait on a model inline. A call that
+# misses its deadline is not cancelled: it finishes in the background and its
+# answer lands in the response cache, where the backfill job picks it up.
+
+DEFAULT_DEADLINES = {
+    'onboard_analysis': 8.0,
+    'progress_encouragement': 3.0,
+    'linkedin_content': 8.0,
+}
+# Backfill jobs wait this long first, so the abandoned call has usually finished
+BACKFILL_DELAY_SECONDS = float(os.getenv('BACKFILL_DELAY_SECONDS', '5'))
+DEADLINE_WORKERS = int(os.getenv('DEADLINE_WORKERS', '32'))
+
+deadline_outcomes = registry.counter(
+    'endpoint_deadline_outcomes_total', 'Inline model calls by outcome (ok, deadline, failed)', ('endpoint', 'outcome'))
+backfills = registry.counter(
+    'provisional_backfills_total', 'Provisional records replaced by the real model result', ('endpoint',))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_deadline(endpoint: str) -> float:
+    value = os.getenv(f'DEADLINE_{endpoint.upper()}_SECONDS')
+    return float(value) if value else DEFAULT_DEADLINES.get(endpoint, 10.0)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads do not survive fork; each Gunicorn worker needs its own pool
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=DEADLINE_WORKERS, thread_name_prefix='deadline')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run_within(seconds: float, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    # Model retries inside fn stop once the endpoint's deadline has passed
+    with call_deadline(seconds):
+        return fn(*args, **kwargs)
+
+
+def run_with_deadline(endpoint: str, fn: Callable[..., Any], *args, **kwargs) -> Optional[Any]:
+    """
+    fn(*args, **kwargs) bounded by the endpoint's deadline. Returns None if it
+    missed the deadline, raised or returned None, so the caller can serve a
+    placeholder and queue a backfill. fn runs on a pool thread without an app
+    context, so it must not touch the database.
+    """
+    deadline = get_deadline(endpoint)
+    # The request's context goes along, so its model calls count for the rate limiter
+    future = _get_executor().submit(contextvars.copy_context().run, _run_within, deadline, fn, args, kwargs)
+    try:
+        result = future.result(timeout=deadline)
+    except FutureTimeoutError:
+        print(f"Deadline of {deadline}s exceeded for {endpoint}; serving a provisional result")
+        deadline_outcomes.inc(endpoint=endpoint, outcome='deadline')
+        return None
+    except Exception as e:
+        print(f"Error in {endpoint}: {e}")
+        deadline_outcomes.inc(endpoint=endpoint, outcome='failed')
+        return None
+    deadline_outcomes.inc(endpoint=endpoint, outcome='ok' if result is not None else 'failed')
+    return result
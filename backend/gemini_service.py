@@ -1,16 +1,236 @@
-from google import genai
-import json
+import asyncio
 import os
-from typing import Dict, List, Optional
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from batcher import MicroBatcher
+from json_stream import PhaseStreamParser
+from llm_backends import get_client
+from llm_cache import ResponseCache, get_response_cache, make_cache_key
+from metrics import (llm_cache_requests, llm_cache_skips, llm_errors, llm_fallbacks, llm_slot_wait_seconds,
+                     llm_stream_first_item_seconds, record_model_call)
+from model_router import get_model_router
+from rate_limiter import note_model_call
+from resilience import async_call_with_retries, call_with_retries, get_breaker, is_retryable, llm_breaker_rejections
+from schemas import (ChatReply, ConversationSummary, EncouragementBatch, LinkedInContent, MonthPlan, ProfileAnalysis, ResumeBullets,
+                     Roadmap, RoadmapPhase, TaskLinkedInPost)
+from singleflight import llm_flight, async_llm_flight
+from structured_output import StructuredOutputError, parse_structured, structured_config
+
+
+def structured_parser(schema, method: str) -> Callable[[str], Dict]:
+    """
+    Parse function for _call that validates output against schema
+    """
+    return lambda text: parse_structured(text, schema, method)
 
-class GeminiService:
+
+def roadmap_parser(timeline_months: int) -> Callable[[str], Dict]:
     """
-    Orchestrates all interactions with Gemini 2.5 API
+    Parse function for generate_growth_path that also rejects a roadmap with
+    fewer months than requested, so a short answer is neither cached nor merged
+    """
+    parse = structured_parser(Roadmap, 'generate_growth_path')
+
+    def parse_roadmap(text: str) -> Dict:
+        roadmap = parse(text)
+        if len(roadmap.get('phases', [])) < timeline_months:
+            raise StructuredOutputError(
+                f"generate_growth_path: expected {timeline_months} phases, got {len(roadmap.get('phases', []))}")
+        return roadmap
+    return parse_roadmap
+
+
+# Roadmaps longer than this are generated as concurrent month ranges
+FANOUT_CHUNK_MONTHS = int(os.getenv('ROADMAP_FANOUT_MONTHS', '3'))
+FANOUT_MAX_WORKERS = int(os.getenv('ROADMAP_FANOUT_WORKERS', '4'))
+# Requests per month range, including the first, before the roadmap fails
+FANOUT_RANGE_ATTEMPTS = max(1, int(os.getenv('ROADMAP_FANOUT_RANGE_ATTEMPTS', '2')))
+
+# Encouragement messages from all request threads are sent as one prompt per
+# window; a batch size of 1 or a window of 0 makes one call per message
+ENCOURAGEMENT_BATCH_SIZE = int(os.getenv('ENCOURAGEMENT_BATCH_SIZE', '16'))
+ENCOURAGEMENT_BATCH_WINDOW_MS = float(os.getenv('ENCOURAGEMENT_BATCH_WINDOW_MS', '200'))
+ENCOURAGEMENT_TIMEOUT = float(os.getenv('ENCOURAGEMENT_TIMEOUT', '30'))
+ENCOURAGEMENT_CONFIG = {"temperature": 0.8, "max_output_tokens": 200}
+
+# ID prefix per roadmap item category, matching the prompt's c1_m1 / p1_m1 scheme
+PHASE_ITEM_PREFIXES = {
+    'courses': 'c',
+    'tests': 't',
+    'internships': 'i',
+    'certificates': 'cert',
+    'projects': 'p',
+}
+
+
+def split_month_ranges(start_month: int, timeline_months: int, chunk_months: int) -> List[tuple]:
+    """
+    Split a horizon into (start_month, months) ranges of at most chunk_months.
+    A chunk size of 0 keeps the whole horizon in one request.
+    """
+    if chunk_months <= 0:
+        return [(start_month, timeline_months)]
+    ranges = []
+    month = start_month
+    end_month = start_month + timeline_months - 1
+    while month <= end_month:
+        span = min(chunk_months, end_month - month + 1)
+        ranges.append((month, span))
+        month += span
+    return ranges
+
+
+class IncompleteRoadmapError(RuntimeError):
+    """Raised when a month range of a fanned-out roadmap is still short after its retries"""
+
+
+def range_phases(chunk: Optional[Dict]) -> List[Dict]:
+    """
+    Valid phases of one month range's roadmap, in month order
+    """
+    phases = [p for p in (chunk or {}).get('phases', []) if isinstance(p, dict)]
+    phases.sort(key=lambda p: p.get('phase', 0) if isinstance(p.get('phase'), int) else 0)
+    return phases
+
+
+def short_ranges(ranges: List[tuple], chunks: List[Optional[Dict]]) -> List[int]:
+    """
+    Indexes of the ranges whose roadmap has fewer phases than months
     """
+    return [i for i, ((_, span), chunk) in enumerate(zip(ranges, chunks)) if len(range_phases(chunk)) < span]
 
-    def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
+
+def merge_phase_chunks(start_month: int, ranges: List[tuple], chunks: List[Dict]) -> Dict:
+    """
+    Merge per-range roadmaps in range order. Each range keeps its own months,
+    so a short range fails the merge instead of shifting later ranges into
+    the gap. Item IDs are rewritten as <prefix><n>_m<month> to stay unique.
+    """
+    merged = []
+    for (range_start, span), chunk in zip(ranges, chunks):
+        phases = range_phases(chunk)
+        if len(phases) < span:
+            raise IncompleteRoadmapError(
+                f"months {range_start}-{range_start + span - 1} returned {len(phases)} of {span} phases")
+
+        for offset, phase in enumerate(phases[:span]):
+            month = range_start + offset
+            phase['phase'] = month
+            title = phase.get('title', '')
+            theme = title.split(':', 1)[1].strip() if ':' in title else title
+            phase['title'] = f"Month {month}: {theme}" if theme else f"Month {month}"
+            for category, prefix in PHASE_ITEM_PREFIXES.items():
+                for index, item in enumerate(phase.get(category) or [], start=1):
+                    if isinstance(item, dict):
+                        item['id'] = f"{prefix}{index}_m{month}"
+            merged.append(phase)
+
+    return {'phases': merged}
+
+
+class _GeminiClient:
+    """
+    Shared model-call plumbing for GeminiService and RoadmapAssistant
+    """
+
+    def __init__(self, api_key: str, cache: Optional[ResponseCache] = None):
+        self.client = get_client(api_key)
+        # Cache namespace; the model for each call comes from the router
         self.model_name = 'gemini-2.0-flash'
+        self.router = get_model_router()
+        self.cache = cache if cache is not None else get_response_cache()
+
+    def _call(self, method: str, prompt: str, config: Optional[Dict] = None,
+              parse: Optional[Callable[[str], Any]] = None,
+              fallback: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Run one model call, returning the fallback value if anything goes wrong
+        """
+        try:
+            return self._generate(method, prompt, config, parse)
+        except Exception as e:
+            print(f"Error in {method}: {e}")
+            llm_fallbacks.inc(method=method)
+            return fallback() if fallback else None
+
+    def _generate(self, method: str, prompt: str, config: Optional[Dict] = None,
+                  parse: Optional[Callable[[str], Any]] = None) -> Any:
+        """
+        Call the model through the response cache. Identical calls already in
+        flight are coalesced onto one request.
+        Only successfully parsed results are cached; errors propagate to the caller.
+        """
+        return self._generate_served(method, prompt, config, parse)[0]
+
+    def _generate_served(self, method: str, prompt: str, config: Optional[Dict] = None,
+                         parse: Optional[Callable[[str], Any]] = None) -> Tuple[Any, Optional[str]]:
+        """
+        _generate, also returning the model that answered (None for a cache hit)
+        """
+        key = make_cache_key(self.model_name, prompt, config)
+        cached = self.cache.get(method, key)
+        llm_cache_requests.inc(method=method, result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached, None
+
+        return llm_flight.do(f"{method}:{key}", lambda: self._fetch(method, key, prompt, config, parse))
+
+    def _fetch(self, method: str, key: str, prompt: str, config: Optional[Dict],
+               parse: Optional[Callable[[str], Any]]) -> Tuple[Any, str]:
+        model = self.router.route(method)
+        response = call_with_retries(method, model, lambda: self._send(method, model, prompt, config))
+
+        result = parse(response.text) if parse else response.text.strip()
+        self._cache_set(method, model, key, result)
+        return result, model
+
+    def _cache_set(self, method: str, model: str, key: str, result: Any, route: Optional[str] = None) -> None:
+        """
+        Cache a result unless a latency-fallback tier produced it: keys don't
+        name the model, so it would outlive the slowdown under the primary's key.
+        route is the router operation when it differs from the cache method.
+        """
+        if self.router.is_primary(route or method, model):
+            self.cache.set(method, key, result)
+        else:
+            llm_cache_skips.inc(method=route or method)
+
+    def _send(self, method: str, model: str, prompt: str, config: Optional[Dict]):
+        """
+        One model round trip, timed and recorded
+        """
+        note_model_call()
+        started = time.perf_counter()
+        try:
+            response = self.client.models.generate_content(**self._request_kwargs(prompt, config, model))
+        except Exception as e:
+            self.router.observe(method, model, time.perf_counter() - started)
+            record_model_call(method, model, prompt, started, error=e)
+            raise
+        self.router.observe(method, model, time.perf_counter() - started)
+        record_model_call(method, model, prompt, started, response)
+        return response
+
+    def _request_kwargs(self, prompt: str, config: Optional[Dict], model: Optional[str] = None) -> Dict:
+        kwargs = {'model': model or self.model_name, 'contents': prompt}
+        if config:
+            kwargs['config'] = config
+        return kwargs
+
+
+class GeminiService(_GeminiClient):
+    """
+    Orchestrates all interactions with Gemini 2.5 API
+    """
+
+    def __init__(self, api_key: str, cache: Optional[ResponseCache] = None):
+        super().__init__(api_key, cache)
 
         # Generation configuration
         self.generation_config = {
@@ -19,9 +239,17 @@ class GeminiService:
             "max_output_tokens": 8192,
         }
 
-    def analyze_student_profile(self, profile_data: Dict) -> Dict:
+        self.encouragement_batcher = MicroBatcher(
+            'encouragement',
+            self.generate_encouragement_batch,
+            max_items=ENCOURAGEMENT_BATCH_SIZE,
+            window=ENCOURAGEMENT_BATCH_WINDOW_MS / 1000
+        )
+
+    def analyze_student_profile(self, profile_data: Dict, use_fallback: bool = True) -> Optional[Dict]:
         """
-        Analyze student profile and provide insights
+        Analyze student profile and provide insights.
+        With use_fallback=False a failed call returns None instead of generic insights.
         """
         prompt = f"""
 You are an expert career advisor analyzing a student's profile.
@@ -54,38 +282,122 @@ Each value should be an array of strings.
 Return ONLY valid JSON, no additional text.
 """
 
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=self.generation_config
-            )
-
-            # Extract JSON from response
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-
-            result = json.loads(response_text.strip())
-            return result
-
-        except Exception as e:
-            print(f"Error in analyze_student_profile: {e}")
-            return {
+        return self._call(
+            'analyze_student_profile',
+            prompt,
+            config=structured_config(ProfileAnalysis, self.generation_config),
+            parse=structured_parser(ProfileAnalysis, 'analyze_student_profile'),
+            fallback=None if not use_fallback else lambda: {
                 "strengths": ["Motivated to learn", "Clear career direction"],
                 "gaps": ["Need more hands-on experience"],
                 "career_paths": ["Technology Professional", "Industry Specialist", "General Professional"],
                 "learning_tips": ["Start with foundational courses", "Build portfolio projects"]
             }
+        )
 
-    def generate_growth_path(self, profile_data: Dict, analysis: Dict, timeline_months: int = 12, start_month: int = 1) -> Dict:
+    def generate_growth_path(self, profile_data: Dict, analysis: Dict, timeline_months: int = 12, start_month: int = 1,
+                             plan_range: Optional[tuple] = None) -> Dict:
         """
         Generate comprehensive phased growth path with MONTHLY phases
         """
+        prompt = self._growth_path_prompt(profile_data, analysis, timeline_months, start_month, plan_range)
+        return self._call(
+            'generate_growth_path',
+            prompt,
+            config=structured_config(Roadmap),
+            parse=roadmap_parser(timeline_months),
+            fallback=lambda: {"phases": []}
+        )
+
+    def stream_growth_path(self, profile_data: Dict, analysis: Dict, timeline_months: int = 12, start_month: int = 1) -> Iterator[Dict]:
+        """
+        Streaming variant of generate_growth_path: yields each phase as soon as
+        the model has finished writing it
+        """
+        prompt = self._growth_path_prompt(profile_data, analysis, timeline_months, start_month)
+        config = structured_config(Roadmap)
+        key = make_cache_key(self.model_name, prompt, config)
+        cached = self.cache.get('generate_growth_path', key)
+        llm_cache_requests.inc(method='stream_growth_path', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            yield from cached.get('phases', [])
+            return
+
+        parser = PhaseStreamParser()
+        model = self.router.route('stream_growth_path')
+        # A half-written stream can't be retried transparently; only the breaker applies
+        breaker = get_breaker(model)
+        if not breaker.allow():
+            print(f"Error in stream_growth_path: circuit for {model} is open")
+            llm_breaker_rejections.inc(method='stream_growth_path', model=model)
+            return
+        note_model_call()
+        started = time.perf_counter()
+        usage = None
+        try:
+            for chunk in self.client.models.generate_content_stream(**self._request_kwargs(prompt, config, model)):
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                for phase in parser.feed(chunk.text or ''):
+                    if len(parser.phases) == 1:
+                        llm_stream_first_item_seconds.observe(time.perf_counter() - started, method='stream_growth_path')
+                    try:
+                        yield RoadmapPhase.model_validate(phase).model_dump(exclude_none=True)
+                    except ValidationError as e:
+                        print(f"Skipping invalid streamed phase: {e}")
+        except Exception as e:
+            print(f"Error in stream_growth_path: {e}")
+            if is_retryable(e):
+                breaker.record_failure()
+            self.router.observe('stream_growth_path', model, time.perf_counter() - started)
+            record_model_call('stream_growth_path', model, prompt, started, error=e)
+            return
+        finally:
+            # Consumer stopped reading mid-stream (GeneratorExit); the backend said nothing
+            breaker.release()
+        breaker.record_success()
+        self.router.observe('stream_growth_path', model, time.perf_counter() - started)
+        record_model_call('stream_growth_path', model, prompt, started,
+                          SimpleNamespace(text=parser.buffer, usage_metadata=usage))
+
+        # Same cache entry as the non-streaming call, so either path can serve the other
+        if parser.finished and parser.phases:
+            try:
+                self._cache_set('generate_growth_path', model, key,
+                                parse_structured(parser.buffer, Roadmap, 'stream_growth_path'), route='stream_growth_path')
+            except StructuredOutputError as e:
+                print(f"Not caching streamed roadmap: {e}")
+
+    def generate_growth_path_fanout(self, profile_data: Dict, analysis: Dict, timeline_months: int = 12, start_month: int = 1,
+                                    chunk_months: Optional[int] = None, max_workers: Optional[int] = None) -> Dict:
+        """
+        Generate a long roadmap as concurrent month-range requests (quarters by
+        default) sharing the same profile and analysis, then merge them. Ranges
+        that come back short are requested again, up to FANOUT_RANGE_ATTEMPTS.
+        """
+        ranges = split_month_ranges(start_month, timeline_months, FANOUT_CHUNK_MONTHS if chunk_months is None else chunk_months)
+        plan_range = (start_month, start_month + timeline_months - 1)
+        chunks = [None] * len(ranges)
+        pending = list(range(len(ranges)))
+        with ThreadPoolExecutor(max_workers=max_workers or FANOUT_MAX_WORKERS) as executor:
+            for _ in range(FANOUT_RANGE_ATTEMPTS):
+                results = executor.map(
+                    lambda i: self.generate_growth_path(
+                        profile_data, analysis,
+                        timeline_months=ranges[i][1],
+                        start_month=ranges[i][0],
+                        plan_range=plan_range
+                    ),
+                    pending
+                )
+                for i, chunk in zip(pending, results):
+                    chunks[i] = chunk
+                pending = short_ranges(ranges, chunks)
+                if not pending:
+                    break
+        return merge_phase_chunks(start_month, ranges, chunks)
+
+    def _growth_path_prompt(self, profile_data: Dict, analysis: Dict, timeline_months: int, start_month: int,
+                            plan_range: Optional[tuple] = None) -> str:
         trend_data = self._get_simulated_trends(profile_data.get('career_aspirations', ''))
         target_role = analysis.get('career_paths', ['Professional'])[0]
         skill_gaps = ', '.join(analysis.get('gaps', []))
@@ -157,55 +469,88 @@ Format as JSON with this EXACT structure:
   ]
 }}
 
+{f"Context: these months are one part of a plan running from Month {plan_range[0]} to Month {plan_range[1]}. Pitch difficulty for where this range sits in the overall plan." if plan_range else ""}
+
 IMPORTANT: Generate exactly {timeline_months} phases, starting from Month {start_month}.
 Each phase number MUST correspond to the actual month number (e.g., {start_month}, {start_month+1}, ...).
 Ensure IDs are unique by including the month number (e.g., _m{start_month}).
 
 Return ONLY valid JSON, no additional text or markdown.
 """
+        return prompt
+
+    def generate_encouragement(self, completed_item: Dict, user_context: Dict, use_fallback: bool = True) -> Optional[str]:
+        """
+        Generate personalized encouragement message. Requests from concurrent
+        users are micro-batched into one model call; the caller blocks until
+        its batch returns. With use_fallback=False a failure returns None.
+        """
+        method = 'generate_encouragement'
+        fallback = f"Great work completing {completed_item.get('item_name')}! You're making excellent progress toward your goals."
+        item = (
+            f"Completed: {completed_item.get('item_name')} ({completed_item.get('item_type')}) | "
+            f"Completed items so far: {user_context.get('completed_count', 0)} | "
+            f"Current phase: {user_context.get('current_phase', 1)} | "
+            f"Career goal: {user_context.get('career_goal', 'Professional development')}"
+        )
+
+        key = make_cache_key(self.model_name, item, ENCOURAGEMENT_CONFIG)
+        cached = self.cache.get(method, key)
+        llm_cache_requests.inc(method=method, result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached
+
         try:
-            print(f"DEBUG: calling model {self.model_name}")
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
-            print("DEBUG: got response")
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            return json.loads(text)
+            message = self.encouragement_batcher.submit(item).result(ENCOURAGEMENT_TIMEOUT)
         except Exception as e:
-            print(f"Error generating growth path: {e}")
-            return {"phases": []}
-
-    def generate_encouragement(self, completed_item: Dict, user_context: Dict) -> str:
+            print(f"Error in {method}: {e}")
+            if not use_fallback:
+                return None
+            llm_fallbacks.inc(method=method)
+            return fallback
+        # Cached per item by generate_encouragement_batch
+        return message
+
+    def generate_encouragement_batch(self, items: Dict[str, str]) -> Dict[str, str]:
         """
-        Generate personalized encouragement message
+        One model call for many encouragement requests, keyed by request ID.
+        Raises on failure; IDs missing from the answer are left out.
         """
+        listing = '\n'.join(f"[{request_id}] {item}" for request_id, item in items.items())
         prompt = f"""
-A student just completed: {completed_item.get('item_name')} ({completed_item.get('item_type')})
+Each line below is a student who just completed an item on their learning roadmap.
 
-Student's journey so far:
-- Completed items: {user_context.get('completed_count', 0)}
-- Current phase: {user_context.get('current_phase', 1)}
-- Career goal: {user_context.get('career_goal', 'Professional development')}
+{listing}
 
-Generate a brief, encouraging message (2-3 sentences) that:
+For EACH student, generate a brief, encouraging message (2-3 sentences) that:
 1. Acknowledges their specific achievement
 2. Connects it to their career goal
 3. Motivates next steps
 
-Keep it genuine, specific, and professional. Do NOT use emojis.
-Return only the message text, nothing else.
+Keep each message genuine, specific, and professional. Do NOT use emojis.
+Messages are shown to different students, so never refer to the other lines.
+
+Return JSON with exactly one entry per ID:
+{{"messages": [{{"id": "r1", "message": "..."}}]}}
 """
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config={"temperature": 0.8, "max_output_tokens": 200}
-            )
-            return response.text.strip()
-        except Exception as e:
-            print(f"Error in generate_encouragement: {e}")
-            return f"Great work completing {completed_item.get('item_name')}! You're making excellent progress toward your goals."
+        config = dict(ENCOURAGEMENT_CONFIG, max_output_tokens=ENCOURAGEMENT_CONFIG['max_output_tokens'] * len(items))
+        result, model = self._generate_served(
+            'generate_encouragement_batch',
+            prompt,
+            config=structured_config(EncouragementBatch, config),
+            parse=structured_parser(EncouragementBatch, 'generate_encouragement_batch')
+        )
+        messages = {
+            entry['id']: entry['message'].strip()
+            for entry in result.get('messages', [])
+            if entry.get('id') in items and entry.get('message', '').strip()
+        }
+        # Only the batch knows which tier answered, so it fills the per-item cache
+        if model is None or self.router.is_primary('generate_encouragement_batch', model):
+            for request_id, message in messages.items():
+                self.cache.set('generate_encouragement',
+                               make_cache_key(self.model_name, items[request_id], ENCOURAGEMENT_CONFIG), message)
+        return messages
 
     def generate_resume_bullets(self, item_data: Dict) -> List[str]:
         """
@@ -234,30 +579,18 @@ Format as JSON array:
 
 Return ONLY valid JSON, no additional text.
 """
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config={"temperature": 0.7, "max_output_tokens": 500}
-            )
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-
-            result = json.loads(response_text.strip())
-            return result.get('bullets', [])
-        except Exception as e:
-            print(f"Error in generate_resume_bullets: {e}")
-            return [
+        return self._call(
+            'generate_resume_bullets',
+            prompt,
+            config=structured_config(ResumeBullets, {"temperature": 0.7, "max_output_tokens": 500}),
+            parse=lambda text: structured_parser(ResumeBullets, 'generate_resume_bullets')(text)['bullets'],
+            fallback=lambda: [
                 f"Completed {item_data.get('title')} demonstrating proficiency in {', '.join(item_data.get('skills', ['various skills']))}",
                 f"Applied technical knowledge to solve real-world problems in {item_data.get('item_type')} context"
             ]
+        )
 
-    def generate_linkedin_content(self, user_context: Dict) -> Dict:
+    def generate_linkedin_content(self, user_context: Dict, use_fallback: bool = True) -> Optional[Dict]:
         """
         Generate LinkedIn post ideas and profile updates
         """
@@ -291,25 +624,12 @@ Format as JSON:
 
 Return ONLY valid JSON, no additional text.
 """
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config={"temperature": 0.8, "max_output_tokens": 1000}
-            )
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-
-            result = json.loads(response_text.strip())
-            return result
-        except Exception as e:
-            print(f"Error in generate_linkedin_content: {e}")
-            return {
+        return self._call(
+            'generate_linkedin_content',
+            prompt,
+            config=structured_config(LinkedInContent, {"temperature": 0.8, "max_output_tokens": 1000}),
+            parse=structured_parser(LinkedInContent, 'generate_linkedin_content'),
+            fallback=None if not use_fallback else lambda: {
                 "post_ideas": [
                     {
                         "topic": "Learning Journey",
@@ -320,6 +640,7 @@ Return ONLY valid JSON, no additional text.
                 "profile_summary": f"Aspiring professional focused on {user_context.get('career_goal', 'continuous learning')} with hands-on experience in recent projects.",
                 "skills_to_add": user_context.get('new_skills', ["Problem Solving", "Project Management"])
             }
+        )
 
     def generate_task_linkedin_post(self, task_data: Dict, user_context: Dict) -> Dict:
         """
@@ -355,29 +676,17 @@ Format as JSON:
 
 Return ONLY valid JSON, no additional text.
 """
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config={"temperature": 0.8, "max_output_tokens": 800}
-            )
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-
-            result = json.loads(response_text.strip())
-            return result
-        except Exception as e:
-            print(f"Error in generate_task_linkedin_post: {e}")
-            return {
+        return self._call(
+            'generate_task_linkedin_post',
+            prompt,
+            config=structured_config(TaskLinkedInPost, {"temperature": 0.8, "max_output_tokens": 800}),
+            parse=structured_parser(TaskLinkedInPost, 'generate_task_linkedin_post'),
+            fallback=lambda: {
                 "post_content": f"Excited to share that I've completed {task_data.get('item_name')}! This is another step forward in my journey toward {user_context.get('career_goal', 'my career goals')}. The learning never stops!",
                 "hashtags": ["learning", "growth", "career", "milestone"],
                 "suggested_image": "A professional achievement or learning-related image"
             }
+        )
 
     def _get_simulated_trends(self, career_field: str) -> str:
         """
@@ -430,16 +739,12 @@ Current Industry Trends (2025-2026):
         }
 
 
-class RoadmapAssistant:
+class RoadmapAssistant(_GeminiClient):
     """
     Interactive AI assistant for roadmap conversations.
     Handles chat, preference adjustments, and single-month task generation.
     """
 
-    def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
-        self.model_name = 'gemini-2.0-flash'
-
     def chat(self, message: str, context: Dict) -> Dict:
         """
         Handle a chat message from the user about their roadmap.
@@ -451,6 +756,9 @@ class RoadmapAssistant:
             role = "User" if msg['role'] == 'user' else "Assistant"
             history += f"{role}: {msg['message']}\n"
         
+        # Older turns arrive pre-summarized (see conversation_memory)
+        summary = context.get('conversation_summary', '')
+
         # Build completed phases summary
         completed_summary = ""
         for phase in context.get('completed_phases', []):
@@ -479,6 +787,7 @@ User Preferences:
 - Project vs Course Balance: {context.get('preferences', {}).get('project_ratio', 50)}% projects
 - Pace: {context.get('preferences', {}).get('pace', 'moderate')}
 
+{f"Earlier Conversation (summary):{chr(10)}{summary}{chr(10)}" if summary else ""}
 Recent Conversation:
 {history}
 
@@ -508,35 +817,59 @@ Format as JSON:
 Return ONLY valid JSON.
 """
 
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config={"temperature": 0.8, "max_output_tokens": 500}
-            )
-
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-
-            return json.loads(response_text.strip())
-
-        except Exception as e:
-            print(f"Error in RoadmapAssistant.chat: {e}")
-            return {
+        return self._call(
+            'chat',
+            prompt,
+            config=structured_config(ChatReply, {"temperature": 0.8, "max_output_tokens": 500}),
+            parse=structured_parser(ChatReply, 'chat'),
+            fallback=lambda: {
                 "response": "I see. Could you elaborate on how you would like to adjust your learning plan?",
                 "action": "none",
                 "action_details": {},
                 "encouragement_score": 7
             }
+        )
 
-    def generate_single_month(self, profile: Dict, month_number: int, preferences: Dict, completed_phases: List = None) -> Dict:
+    def summarize_conversation(self, previous_summary: str, messages: List[Dict], max_words: int = 200) -> Optional[str]:
+        """
+        Fold older chat messages into the rolling summary. Returns None on failure.
+        """
+        transcript = "\n".join(
+            f"{'User' if m['role'] == 'user' else 'Assistant'}: {m['message'][:2000]}"
+            for m in messages
+        )
+        prompt = f"""
+You maintain a running memory of a student's conversation with their roadmap assistant.
+
+Current summary:
+{previous_summary if previous_summary else "(empty)"}
+
+New messages to fold in:
+{transcript}
+
+Write an updated summary of at most {max_words} words that keeps:
+- Goals, constraints and preferences the student stated
+- Changes to the roadmap that were requested or agreed
+- Open questions or struggles worth following up on
+
+Drop greetings and small talk. Write in third person about "the student". Do NOT use emojis.
+
+Format as JSON:
+{{"summary": "..."}}
+"""
+        # Unwrapped in parse, not here, so AsyncRoadmapAssistant inherits a working coroutine
+        return self._call(
+            'summarize_conversation',
+            prompt,
+            config=structured_config(ConversationSummary, {"temperature": 0.3, "max_output_tokens": max_words * 2}),
+            parse=lambda text: structured_parser(ConversationSummary, 'summarize_conversation')(text)['summary'] or None
+        )
+
+    def generate_single_month(self, profile: Dict, month_number: int, preferences: Dict, completed_phases: List = None,
+                              use_fallback: bool = True) -> Optional[Dict]:
         """
         Generate tasks for a SINGLE month based on preferences.
+        With use_fallback=False a failed call returns None instead of placeholder tasks.
         """
         
         project_ratio = preferences.get('project_ratio', 50)
@@ -599,26 +932,12 @@ Format as JSON:
 Return ONLY valid JSON.
 """
 
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config={"temperature": 0.7, "max_output_tokens": 1000}
-            )
-
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.startswith('```'):
-                response_text = response_text[3:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-
-            return json.loads(response_text.strip())
-
-        except Exception as e:
-            print(f"Error in generate_single_month: {e}")
-            return {
+        return self._call(
+            'generate_single_month',
+            prompt,
+            config=structured_config(MonthPlan, {"temperature": 0.7, "max_output_tokens": 1000}),
+            parse=structured_parser(MonthPlan, 'generate_single_month'),
+            fallback=None if not use_fallback else lambda: {
                 "month": month_number,
                 "title": f"Month {month_number}: Building Skills",
                 "focus": "Continue your learning journey",
@@ -633,4 +952,152 @@ Return ONLY valid JSON.
                     }
                 ],
                 "motivation": "Dedication is key to mastery."
-            }
\ No newline at end of file
+            }
+        )
+
+
+# ============================================================================
+# ASYNCIO VARIANTS
+# ============================================================================
+
+# Max number of in-flight model calls per process, shared by every async service
+MAX_CONCURRENT_CALLS = int(os.getenv('GEMINI_MAX_CONCURRENCY', '8'))
+# Per-call deadline in seconds (queueing for a slot counts against it)
+DEFAULT_CALL_TIMEOUT = float(os.getenv('GEMINI_CALL_TIMEOUT', '60'))
+
+_call_slots = weakref.WeakKeyDictionary()
+
+
+def _get_call_slots() -> asyncio.Semaphore:
+    """
+    Semaphore bounding in-flight model calls on the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    slots = _call_slots.get(loop)
+    if slots is None:
+        slots = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+        _call_slots[loop] = slots
+    return slots
+
+
+class _AsyncGeminiClient:
+    """
+    Mixin that turns _call into a coroutine built on the SDK's async surface.
+    Every public method of the sync class then returns an awaitable.
+    """
+
+    # Per-method deadline overrides in seconds
+    call_timeouts = {
+        'generate_growth_path': 120.0,
+    }
+
+    async def _call(self, method: str, prompt: str, config: Optional[Dict] = None,
+                    parse: Optional[Callable[[str], Any]] = None,
+                    fallback: Optional[Callable[[], Any]] = None) -> Any:
+        try:
+            return await self._agenerate(method, prompt, config, parse)
+        except asyncio.TimeoutError:
+            print(f"Error in {method}: deadline of {self._timeout_for(method)}s exceeded")
+            llm_errors.inc(method=method, error='DeadlineExceeded')
+            llm_fallbacks.inc(method=method)
+            return fallback() if fallback else None
+        except Exception as e:
+            print(f"Error in {method}: {e}")
+            llm_fallbacks.inc(method=method)
+            return fallback() if fallback else None
+
+    async def _agenerate(self, method: str, prompt: str, config: Optional[Dict] = None,
+                         parse: Optional[Callable[[str], Any]] = None) -> Any:
+        key = make_cache_key(self.model_name, prompt, config)
+        cached = self.cache.get(method, key)
+        llm_cache_requests.inc(method=method, result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached
+
+        # The shared request outlives a waiter that hits its deadline, so a
+        # late answer still lands in the cache for the next caller
+        return await asyncio.wait_for(
+            async_llm_flight.do(f"{method}:{key}", lambda: self._afetch(method, key, prompt, config, parse)),
+            timeout=self._timeout_for(method)
+        )
+
+    async def _afetch(self, method: str, key: str, prompt: str, config: Optional[Dict],
+                      parse: Optional[Callable[[str], Any]]) -> Any:
+        model = self.router.route(method)
+        timeout = self._timeout_for(method)
+        # Retries stop once the next backoff would run past the call's deadline
+        response = await asyncio.wait_for(
+            async_call_with_retries(method, model, lambda: self._acquire_and_generate(method, model, prompt, config),
+                                    deadline=time.perf_counter() + timeout),
+            timeout=timeout
+        )
+
+        result = parse(response.text) if parse else response.text.strip()
+        self._cache_set(method, model, key, result)
+        return result
+
+    async def _acquire_and_generate(self, method: str, model: str, prompt: str, config: Optional[Dict]):
+        queued = time.perf_counter()
+        async with _get_call_slots():
+            started = time.perf_counter()
+            llm_slot_wait_seconds.observe(started - queued, method=method)
+            note_model_call()
+            try:
+                response = await self.client.aio.models.generate_content(**self._request_kwargs(prompt, config, model))
+            except BaseException as e:
+                # Includes cancellation when the per-call deadline fires
+                self.router.observe(method, model, time.perf_counter() - started)
+                record_model_call(method, model, prompt, started, error=e)
+                raise
+            self.router.observe(method, model, time.perf_counter() - started)
+            record_model_call(method, model, prompt, started, response)
+            return response
+
+    def _timeout_for(self, method: str) -> float:
+        return self.call_timeouts.get(method, DEFAULT_CALL_TIMEOUT)
+
+
+class AsyncGeminiService(_AsyncGeminiClient, GeminiService):
+    """
+    GeminiService whose methods are coroutines, for use from an event loop
+    """
+
+    async def generate_encouragement(self, completed_item: Dict, user_context: Dict, use_fallback: bool = True) -> Optional[str]:
+        """
+        Joins the same micro-batches as the sync version, waiting off the loop
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, GeminiService.generate_encouragement, self, completed_item, user_context, use_fallback)
+
+    async def generate_growth_path_fanout(self, profile_data: Dict, analysis: Dict, timeline_months: int = 12, start_month: int = 1,
+                                          chunk_months: Optional[int] = None, max_workers: Optional[int] = None) -> Dict:
+        """
+        Fan-out on the event loop; concurrency is bounded by the shared call
+        semaphore rather than max_workers
+        """
+        ranges = split_month_ranges(start_month, timeline_months, FANOUT_CHUNK_MONTHS if chunk_months is None else chunk_months)
+        plan_range = (start_month, start_month + timeline_months - 1)
+        chunks = [None] * len(ranges)
+        pending = list(range(len(ranges)))
+        for _ in range(FANOUT_RANGE_ATTEMPTS):
+            results = await asyncio.gather(*[
+                self.generate_growth_path(
+                    profile_data, analysis,
+                    timeline_months=ranges[i][1],
+                    start_month=ranges[i][0],
+                    plan_range=plan_range
+                )
+                for i in pending
+            ])
+            for i, chunk in zip(pending, results):
+                chunks[i] = chunk
+            pending = short_ranges(ranges, chunks)
+            if not pending:
+                break
+        return merge_phase_chunks(start_month, ranges, chunks)
+
+
+class AsyncRoadmapAssistant(_AsyncGeminiClient, RoadmapAssistant):
+    """
+    RoadmapAssistant whose methods are coroutines, for use from an event loop
+    """
@@ -0,0 +1,11 @@
+import multiprocessing
+import os
+
+# Threaded workers: a request waiting on the model only parks its own thread,
+# so health checks and plain GETs keep being served by the other threads.
+# The number of concurrent model calls is bounded separately by GEMINI_MAX_CONCURRENCY.
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '180'))
@@ -0,0 +1,66 @@
+import re
+from typing import Dict, Optional
+
+from metrics import registry
+
+# Rule-based detector for the chat requests that only change preferences.
+# It only answers when a message is short, unambiguous and has no question or
+# negation in it; anything else goes to the model as before.
+
+MAX_WORDS = 25
+CONFIDENCE_THRESHOLD = 0.8
+
+chat_routes = registry.counter(
+    'chat_intent_routes_total', 'Chat messages by detected intent and where they were answered', ('intent', 'route'))
+
+# (action, direction, pattern); first match wins
+_RULES = (
+    ('adjust_pace', 'relaxed', r'\b(slow(er|ing)? (it )?down|slower( pace)?|relax(ed)?( pace)?|ease (up|off)|lighter (load|workload|pace)|less intense|take it easy|too (much|fast|intense))\b'),
+    ('adjust_pace', 'intensive', r'\b(speed (it )?up|faster( pace)?|more intense|intensive( pace)?|accelerate|step it up|pick up the pace)\b'),
+    ('adjust_pace', 'moderate', r'\b(moderate|normal|regular|medium) pace\b'),
+    ('adjust_projects', 'increase', r'\b(more (hands.on|practical )?projects?|more hands.on|fewer courses|less courses|less theory)\b'),
+    ('adjust_projects', 'decrease', r'\b(more courses|fewer projects|less projects|more theory)\b'),
+    ('skip_task', None, r'\b(skip|drop|remove) (this|that|the|a|one|my)\b'),
+)
+_NEGATION = re.compile(r"\b(not|don'?t|do not|never|no|without|instead of|rather than)\b", re.I)
+_HEDGE = re.compile(r'\b(maybe|should i|could i|would it|what if|whether|or)\b', re.I)
+
+
+def classify_intent(message: str) -> Optional[Dict]:
+    """
+    Returns {'action', 'direction', 'confidence'} for a high-confidence
+    preference change, or None when the model should handle the message
+    """
+    text = ' '.join((message or '').lower().split())
+    if not text or '?' in text or len(text.split()) > MAX_WORDS or _NEGATION.search(text):
+        return None
+
+    matches = [(action, direction) for action, direction, pattern in _RULES if re.search(pattern, text)]
+    # Two different requests in one message (e.g. slower pace and more projects) need the model
+    if len(set(matches)) != 1:
+        return None
+
+    action, direction = matches[0]
+    confidence = 0.9 if not _HEDGE.search(text) else 0.6
+    if confidence < CONFIDENCE_THRESHOLD:
+        return None
+    return {'action': action, 'direction': direction, 'confidence': confidence}
+
+
+def templated_reply(intent: Dict, preferences: Dict) -> str:
+    """
+    Reply for a locally handled intent, after preferences were updated
+    """
+    if intent['action'] == 'adjust_pace':
+        detail = {
+            'relaxed': 'Upcoming months will have fewer tasks so the workload stays manageable.',
+            'intensive': 'Upcoming months will include more tasks so you can progress faster.',
+            'moderate': 'Upcoming months will return to a balanced workload.',
+        }[intent['direction']]
+        return f"Understood. I've set your pace to {preferences['pace']}. {detail} You can change it again at any time."
+    if intent['action'] == 'adjust_projects':
+        lean = 'hands-on projects' if intent['direction'] == 'increase' else 'structured courses'
+        return (f"Done. Upcoming months will lean more toward {lean}; your plan is now "
+                f"{preferences['project_ratio']}% projects. You can adjust the balance again at any time.")
+    return ("Understood. You can skip a task by leaving it unfinished; the next month unlocks once most of "
+            "this month's tasks are complete, so focus on the ones that matter most to you.")
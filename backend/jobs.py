@@ -0,0 +1,246 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from metrics import registry
+from models import db, BackgroundJob, SchedulerLease
+
+# Durable job queue on the application database. Work enqueued inside a request
+# commits atomically with the request's own changes, and is picked up by
+# JobWorker threads, either embedded in the web process or run standalone via
+# worker.py. Claims are a conditional UPDATE, so any number of workers across
+# processes can poll the same table.
+
+JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', '2'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '0.5'))
+# A running job whose worker died is handed out again once its lease expires
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '300'))
+JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', '5'))
+
+_handlers = {}
+
+job_runs = registry.counter(
+    'background_job_runs_total', 'Background job executions by outcome', ('job_type', 'outcome'))
+job_seconds = registry.histogram(
+    'background_job_duration_seconds', 'Background job run time', ('job_type',))
+job_queue_delay = registry.histogram(
+    'background_job_queue_delay_seconds', 'Time from enqueue (or retry time) to start', ('job_type',))
+
+
+def job_handler(job_type: str) -> Callable:
+    """
+    Register fn(payload, user_id) as the handler for job_type. The handler
+    runs inside an app context; its return value is stored as the job result.
+    """
+    def register(fn: Callable[[Dict, Optional[int]], Any]) -> Callable:
+        _handlers[job_type] = fn
+        return fn
+    return register
+
+
+def enqueue_job(job_type: str, user_id: Optional[int] = None, payload: Optional[Dict] = None,
+                dedupe_key: Optional[str] = None, delay_seconds: float = 0, max_attempts: int = 3) -> BackgroundJob:
+    """
+    Add a job to the current session; it becomes visible to workers when the
+    caller commits. With a dedupe_key, an unfinished job with the same key is
+    returned instead of queueing a second one.
+    """
+    if dedupe_key:
+        existing = BackgroundJob.query.filter(
+            BackgroundJob.dedupe_key == dedupe_key,
+            BackgroundJob.status.in_(['queued', 'running'])
+        ).first()
+        if existing:
+            return existing
+
+    job = BackgroundJob(
+        job_type=job_type,
+        user_id=user_id,
+        dedupe_key=dedupe_key,
+        max_attempts=max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_seconds)
+    )
+    job.set_payload(payload or {})
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def claim_next_job(worker_id: str) -> Optional[BackgroundJob]:
+    """
+    Atomically take the oldest runnable job, or None if there is nothing to do
+    """
+    now = datetime.utcnow()
+    runnable = or_(
+        and_(BackgroundJob.status == 'queued', BackgroundJob.run_after <= now),
+        and_(BackgroundJob.status == 'running', BackgroundJob.lease_expires_at < now)
+    )
+    candidate = db.session.query(BackgroundJob.id).filter(runnable).order_by(BackgroundJob.id).first()
+    if candidate is None:
+        db.session.rollback()
+        return None
+
+    claimed = BackgroundJob.query.filter(BackgroundJob.id == candidate.id, runnable).update({
+        'status': 'running',
+        'locked_by': worker_id,
+        'started_at': now,
+        'lease_expires_at': now + timedelta(seconds=JOB_LEASE_SECONDS),
+        'attempts': BackgroundJob.attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        # Another worker got there first
+        return None
+    return db.session.get(BackgroundJob, candidate.id)
+
+
+def run_job(job: BackgroundJob) -> None:
+    """
+    Execute a claimed job and record the outcome; failures are retried with
+    exponential backoff until max_attempts
+    """
+    started = time.perf_counter()
+    job_queue_delay.observe(max(0.0, (job.started_at - job.run_after).total_seconds()), job_type=job.job_type)
+    handler = _handlers.get(job.job_type)
+    try:
+        if handler is None:
+            raise LookupError(f"no handler registered for job type {job.job_type}")
+        result = handler(job.get_payload(), job.user_id)
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(BackgroundJob, job.id)
+        print(f"Error in job {job.id} ({job.job_type}): {e}")
+        job.error = str(e)
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_after = datetime.utcnow() + timedelta(seconds=JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+            job_runs.inc(job_type=job.job_type, outcome='retry')
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            job_runs.inc(job_type=job.job_type, outcome='failed')
+    else:
+        job.status = 'succeeded'
+        job.error = None
+        job.set_result(result if result is not None else {})
+        job.finished_at = datetime.utcnow()
+        job_runs.inc(job_type=job.job_type, outcome='succeeded')
+    job.lease_expires_at = None
+    db.session.commit()
+    job_seconds.observe(time.perf_counter() - started, job_type=job.job_type)
+
+
+def run_pending_jobs(app, limit: Optional[int] = None, worker_id: str = 'inline') -> int:
+    """
+    Drain runnable jobs in the calling thread; returns how many ran
+    """
+    ran = 0
+    with app.app_context():
+        while limit is None or ran < limit:
+            job = claim_next_job(worker_id)
+            if job is None:
+                break
+            run_job(job)
+            ran += 1
+    return ran
+
+
+class JobWorker:
+    """
+    Pool of polling threads that run queued jobs for a Flask app
+    """
+
+    def __init__(self, app, threads: int = JOB_WORKER_THREADS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.app = app
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            # Threads do not survive fork; each Gunicorn worker starts its own
+            if self._pid == os.getpid() and any(t.is_alive() for t in self._threads):
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._threads = []
+            for index in range(self.threads):
+                worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+                thread = threading.Thread(target=self._loop, args=(worker_id,), name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_forever(self) -> None:
+        self.start()
+        try:
+            while any(t.is_alive() for t in self._threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def _loop(self, worker_id: str) -> None:
+        while not self._stop.is_set():
+            try:
+                ran = run_pending_jobs(self.app, limit=1, worker_id=worker_id)
+            except Exception as e:
+                print(f"Error in job worker {worker_id}: {e}")
+                ran = 0
+            if not ran:
+                self._stop.wait(self.poll_interval)
+
+
+def acquire_lease(name: str, owner: str, seconds: float) -> bool:
+    """
+    Take or renew the named lease for owner; False while someone else holds it
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    taken = SchedulerLease.query.filter(
+        SchedulerLease.name == name,
+        or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < now)
+    ).update({'owner': owner, 'expires_at': expires_at}, synchronize_session=False)
+    if taken:
+        db.session.commit()
+        return True
+    if db.session.get(SchedulerLease, name) is not None:
+        db.session.rollback()
+        return False
+    try:
+        db.session.add(SchedulerLease(name=name, owner=owner, expires_at=expires_at))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Lost the race to create it
+        db.session.rollback()
+        return False
+
+
+def release_lease(name: str, owner: str) -> None:
+    SchedulerLease.query.filter_by(name=name, owner=owner).delete()
+    db.session.commit()
+
+
+def job_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Job counts per type and status
+    """
+    rows = db.session.query(BackgroundJob.job_type, BackgroundJob.status, db.func.count(BackgroundJob.id)) \
+        .group_by(BackgroundJob.job_type, BackgroundJob.status).all()
+    stats = {}
+    for job_type, status, count in rows:
+        stats.setdefault(job_type, {})[status] = count
+    return stats
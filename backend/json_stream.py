@@ -0,0 +1,82 @@
+import json
+import re
+from typing import Dict, List
+
+_ARRAY_START = re.compile(r'"phases"\s*:\s*\[')
+
+
+class PhaseStreamParser:
+    """
+    Incremental parser for a streamed roadmap of the form {"phases": [ {...}, ... ]}.
+    Text chunks are fed in as they arrive and every element of the phases
+    array is returned as soon as its closing brace has been seen, without
+    waiting for the rest of the document.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self._pos = None        # scan position once the array has been found
+        self._depth = 0         # nesting depth relative to the phases array
+        self._in_string = False
+        self._escape = False
+        self._element_start = None
+        self.finished = False
+        self.phases = []
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """
+        Consume a chunk of model output, returns the phases completed by it
+        """
+        if self.finished or not chunk:
+            return []
+        self.buffer += chunk
+
+        if self._pos is None:
+            match = _ARRAY_START.search(self.buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        completed = []
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._depth == 0 and ch == '{':
+                    self._element_start = i
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 0:
+                    # End of the phases array
+                    self.finished = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._element_start is not None:
+                    phase = self._load(buffer[self._element_start:i + 1])
+                    if phase is not None:
+                        completed.append(phase)
+                    self._element_start = None
+            i += 1
+        self._pos = i
+
+        self.phases.extend(completed)
+        return completed
+
+    def _load(self, text: str):
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            print(f"Error parsing streamed phase: {e}")
+            return None
+        return value if isinstance(value, dict) else None
@@ -0,0 +1,411 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+from google import genai
+from google.genai import types
+
+from metrics import registry
+
+# Model backends. Services talk to whatever create_client() returns through the
+# genai.Client surface they already use: models.generate_content,
+# models.generate_content_stream and aio.models.generate_content, each
+# returning objects with .text and .usage_metadata.
+#
+#   LLM_BACKEND=gemini  (default) the real API, needs GEMINI_API_KEY
+#   LLM_BACKEND=fake    offline, deterministic, schema-valid responses for load testing
+
+# Connection pool for the model API, shared by every service in the process.
+# Keep max connections at or above GEMINI_MAX_CONCURRENCY plus the sync
+# callers (Gunicorn threads) so requests don't queue for a socket.
+HTTP_MAX_CONNECTIONS = int(os.getenv('GEMINI_HTTP_MAX_CONNECTIONS', '32'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('GEMINI_HTTP_MAX_KEEPALIVE', '16'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('GEMINI_HTTP_KEEPALIVE_EXPIRY', '120'))
+
+
+def get_backend_name() -> str:
+    return os.getenv('LLM_BACKEND', 'gemini').strip().lower()
+
+
+def create_client(api_key: Optional[str] = None):
+    """
+    New model client for the configured backend. Prefer get_client(), which
+    shares one client (and its connection pool) per process.
+    """
+    if get_backend_name() == 'fake':
+        return FakeClient(FakeBackendConfig.from_env())
+
+    limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                          max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                          keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+    sync_http = httpx.Client(limits=limits)
+    async_http = httpx.AsyncClient(limits=limits)
+    _track_pool('sync', sync_http)
+    _track_pool('async', async_http)
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(httpx_client=sync_http, httpx_async_client=async_http)
+    )
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_pid = None
+
+
+def get_client(api_key: Optional[str] = None):
+    """
+    Process-wide client for the configured backend, so GeminiService,
+    RoadmapAssistant and background workers reuse the same keep-alive
+    connections. Rebuilt after fork; Gunicorn workers never share sockets.
+    """
+    global _clients_pid
+    key = (get_backend_name(), api_key)
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _pools.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(key)
+        if client is None:
+            client = create_client(api_key)
+            _clients[key] = client
+        return client
+
+
+# ----------------------------------------------------------------------------
+# Pool metrics
+# ----------------------------------------------------------------------------
+
+_pools = {}
+
+http_pool_connections = registry.gauge(
+    'llm_http_pool_connections', 'Model API connections by state', ('client', 'state'))
+http_pool_requests = registry.gauge(
+    'llm_http_pool_requests', 'Requests in the pool, including those waiting for a connection', ('client',))
+http_pool_max_connections = registry.gauge(
+    'llm_http_pool_max_connections', 'Configured connection limit', ('client',))
+http_connections_opened = registry.counter(
+    'llm_http_connections_opened_total', 'New model API connections (each one a TCP+TLS handshake)', ('client',))
+
+
+def _track_pool(name: str, http_client) -> None:
+    # httpx does not expose pool state publicly; read it from the underlying
+    # httpcore pool, and count connection creation to measure socket churn
+    pool = getattr(getattr(http_client, '_transport', None), '_pool', None)
+    if pool is None:
+        return
+    create_connection = pool.create_connection
+
+    def counting_create_connection(*args, **kwargs):
+        http_connections_opened.inc(client=name)
+        return create_connection(*args, **kwargs)
+
+    pool.create_connection = counting_create_connection
+    _pools[name] = pool
+
+
+@registry.collector
+def collect_pool_stats() -> None:
+    for name, pool in list(_pools.items()):
+        connections = list(pool.connections)
+        active = sum(1 for connection in connections if not connection.is_idle())
+        http_pool_connections.set(active, client=name, state='active')
+        http_pool_connections.set(len(connections) - active, client=name, state='idle')
+        http_pool_requests.set(len(getattr(pool, '_requests', [])), client=name)
+        http_pool_max_connections.set(HTTP_MAX_CONNECTIONS, client=name)
+
+
+class FakeBackendError(RuntimeError):
+    """Injected failure, raised at the configured FAKE_LLM_ERROR_RATE"""
+    # Behaves like a transient 503 so retries and the circuit breaker engage
+    code = 503
+
+
+class FakeBackendConfig:
+    """
+    Latency and token model for the fake backend. Latency per call is
+    base + per-output-token cost, plus uniform jitter in [-jitter, +jitter].
+    """
+
+    def __init__(self, latency_ms: float = 800, jitter_ms: float = 200, ms_per_output_token: float = 0,
+                 error_rate: float = 0.0, chars_per_token: float = 4.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_output_token = ms_per_output_token
+        self.error_rate = error_rate
+        self.chars_per_token = chars_per_token
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls) -> 'FakeBackendConfig':
+        return cls(
+            latency_ms=float(os.getenv('FAKE_LLM_LATENCY_MS', '800')),
+            jitter_ms=float(os.getenv('FAKE_LLM_JITTER_MS', '200')),
+            ms_per_output_token=float(os.getenv('FAKE_LLM_MS_PER_OUTPUT_TOKEN', '0')),
+            error_rate=float(os.getenv('FAKE_LLM_ERROR_RATE', '0')),
+            chars_per_token=float(os.getenv('FAKE_LLM_CHARS_PER_TOKEN', '4')),
+            seed=int(os.getenv('FAKE_LLM_SEED', '0')),
+        )
+
+
+class FakeClient:
+    """
+    Drop-in stand-in for genai.Client that never touches the network.
+    Response content depends only on the prompt, schema and seed, so the same
+    request always gets the same answer; latency and injected errors are drawn
+    from a seeded generator shared by the client.
+    """
+
+    def __init__(self, config: Optional[FakeBackendConfig] = None):
+        self.config = config or FakeBackendConfig()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self.calls = 0
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+
+    def respond(self, contents, config: Optional[Dict]) -> SimpleNamespace:
+        """
+        Build the response for one call (no waiting), or raise an injected error
+        """
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        with self._rng_lock:
+            self.calls += 1
+            failed = self._rng.random() < self.config.error_rate
+            jitter = self._rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        if failed:
+            raise FakeBackendError('fake backend: injected error')
+
+        schema = (config or {}).get('response_schema')
+        name = getattr(schema, '__name__', None)
+        rng = random.Random(f"{self.config.seed}:{name}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}")
+        builder = _BUILDERS.get(name)
+        text = json.dumps(builder(prompt, rng)) if builder else _encouragement(prompt, rng)
+
+        prompt_tokens = self._tokens(prompt)
+        output_tokens = self._tokens(text)
+        delay = max(0.0, self.config.latency_ms + jitter + output_tokens * self.config.ms_per_output_token) / 1000
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                                total_token_count=prompt_tokens + output_tokens)
+        return SimpleNamespace(text=text, usage_metadata=usage, delay=delay)
+
+    def _tokens(self, text: str) -> int:
+        return max(1, int(len(text) / self.config.chars_per_token))
+
+
+class _FakeModels:
+    def __init__(self, client: FakeClient):
+        self._client = client
+
+    def generate_content(self, model: str = None, contents=None, config: Optional[Dict] = None):
+        response = self._client.respond(contents, config)
+        time.sleep(response.delay)
+        return response
+
+    def generate_content_stream(self, model: str = None, contents=None, config: Optional[Dict] = None) -> Iterator:
+        response = self._client.respond(contents, config)
+        chunks = _split(response.text, 8)
+        for index, chunk in enumerate(chunks):
+            time.sleep(response.delay / len(chunks))
+            last = index == len(chunks) - 1
+            yield SimpleNamespace(text=chunk, usage_metadata=response.usage_metadata if last else None)
+
+
+class _FakeAsyncModels:
+    def __init__(self, client: FakeClient):
+        self._client = client
+
+    async def generate_content(self, model: str = None, contents=None, config: Optional[Dict] = None):
+        response = self._client.respond(contents, config)
+        await asyncio.sleep(response.delay)
+        return response
+
+
+def _split(text: str, parts: int) -> List[str]:
+    size = max(1, -(-len(text) // parts))
+    return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+
+# ----------------------------------------------------------------------------
+# Response builders, keyed by response schema name. Inputs are read back out of
+# the prompt text so responses reflect the request (months, counts, names).
+# ----------------------------------------------------------------------------
+
+_TOPICS = ['Python', 'SQL', 'Data Structures', 'System Design', 'Cloud Fundamentals', 'Machine Learning',
+           'Statistics', 'Git', 'Web APIs', 'Testing', 'Docker', 'Linux', 'Algorithms', 'Security Basics']
+_PLATFORMS = ['Coursera', 'edX', 'Udemy', 'freeCodeCamp', 'Pluralsight']
+
+
+def _field(prompt: str, label: str, default: str = '') -> str:
+    match = re.search(rf'{re.escape(label)}:\s*(.*)', prompt)
+    value = match.group(1).strip() if match else ''
+    return value if value and value != 'None' else default
+
+
+def _int(pattern: str, prompt: str, default: int) -> int:
+    match = re.search(pattern, prompt)
+    return int(match.group(1)) if match else default
+
+
+def _profile_analysis(prompt: str, rng: random.Random) -> Dict:
+    major = _field(prompt, 'Major', 'General Studies')
+    goal = _field(prompt, 'Career Aspirations', 'Software Engineer')
+    topics = rng.sample(_TOPICS, 4)
+    return {
+        'strengths': [f"Academic grounding in {major}", f"Clear interest in {goal}"],
+        'gaps': [f"Limited hands-on {topics[0]} experience", f"No portfolio work in {topics[1]}"],
+        'career_paths': [goal, f"{major} Specialist", 'Technology Professional'],
+        'learning_tips': [f"Pair each {topics[2]} course with a small project", 'Review progress weekly'],
+    }
+
+
+def _roadmap(prompt: str, rng: random.Random) -> Dict:
+    start = _int(r'from Month (\d+) to Month \d+', prompt, 1)
+    end = _int(r'from Month \d+ to Month (\d+)', prompt, start)
+    role = _field(prompt, 'Target Role', 'Professional')
+    phases = []
+    for month in range(start, end + 1):
+        topic, second, third = rng.sample(_TOPICS, 3)
+        phase = {
+            'phase': month,
+            'title': f"Month {month}: {topic}",
+            'focus': f"{topic} for {role}",
+            'courses': [{
+                'id': f"c{index}_m{month}", 'name': f"{name} Essentials", 'platform': rng.choice(_PLATFORMS),
+                'duration': f"{rng.randint(2, 4)} weeks", 'rationale': f"Core skill for {role}",
+            } for index, name in enumerate([topic, third][:rng.randint(1, 2)] + [f"Applied {topic}"], start=1)],
+            'tests': [],
+            'internships': [],
+            'certificates': [],
+            'projects': [],
+        }
+        if month % 2 == 0:
+            phase['projects'].append({
+                'id': f"p1_m{month}", 'name': f"{second} Portfolio Project",
+                'description': f"Build and publish a small {second} project",
+                'skills_demonstrated': [topic, second], 'rationale': 'Demonstrates applied skills',
+            })
+        if month % 3 == 0:
+            phase['certificates'].append({
+                'id': f"cert1_m{month}", 'name': f"{topic} Associate", 'provider': rng.choice(_PLATFORMS),
+                'timing': 'End of month', 'rationale': 'Validates the quarter\'s learning',
+            })
+        if month % 6 == 0:
+            phase['internships'].append({
+                'id': f"i1_m{month}", 'type': 'Summer internship', 'when': 'Apply this month',
+                'companies': ['Acme Corp', 'Globex'], 'rationale': 'Hiring cycle opens',
+            })
+        phases.append(phase)
+    return {'phases': phases}
+
+
+def _month_plan(prompt: str, rng: random.Random) -> Dict:
+    month = _int(r'MONTH (\d+)', prompt, 1)
+    total = _int(r'Generate exactly (\d+) tasks', prompt, 4)
+    projects = min(total, _int(r'- (\d+) practical projects', prompt, 1))
+    topics = [rng.choice(_TOPICS) for _ in range(total)]
+    tasks = []
+    for index, topic in enumerate(topics, start=1):
+        kind = 'project' if index <= projects else 'course'
+        tasks.append({
+            'id': f"m{month}_t{index}", 'type': kind,
+            'name': f"{topic} {'Build' if kind == 'project' else 'Course'}",
+            'description': f"{'Build a working' if kind == 'project' else 'Study'} {topic}",
+            'duration': f"{rng.randint(1, 4)} weeks", 'rationale': f"Progresses {topic}",
+        })
+    return {'month': month, 'title': f"Month {month}: {topics[0]}", 'focus': f"{topics[0]} in practice",
+            'tasks': tasks, 'motivation': 'Steady progress compounds.'}
+
+
+_CHAT_ACTIONS = (
+    ('skip_task', r'\bskip\b|\bdrop\b|\bremove\b'),
+    ('adjust_pace', r'\bslow|\bfaster\b|\bpace\b|\bbusy\b|\bexams?\b|\btoo (much|hard)\b'),
+    ('adjust_projects', r'\bprojects?\b|\bhands.on\b'),
+)
+
+
+def _chat_reply(prompt: str, rng: random.Random) -> Dict:
+    message = _field(prompt, 'Current User Message')
+    action = next((name for name, pattern in _CHAT_ACTIONS if re.search(pattern, message, re.I)), 'none')
+    reply = {
+        'none': "Good question. Keep focusing on this month's tasks and review what you learned at the end of each week.",
+        'skip_task': "Understood. I can move that task out of this month so you can focus on the rest.",
+        'adjust_pace': "Understood. I can ease the pace for the coming month so the workload stays manageable.",
+        'adjust_projects': "Understood. I can shift the balance of upcoming months toward hands-on projects.",
+    }[action]
+    return {'response': reply, 'action': action, 'encouragement_score': rng.randint(5, 9)}
+
+
+def _resume_bullets(prompt: str, rng: random.Random) -> Dict:
+    title = _field(prompt, 'Title', 'the project')
+    skills = _field(prompt, 'Skills Used', 'core tools')
+    return {'bullets': [
+        f"Developed {title} using {skills}",
+        f"Improved delivery time by {rng.randint(10, 40)}% through iterative testing",
+    ]}
+
+
+def _linkedin_content(prompt: str, rng: random.Random) -> Dict:
+    goal = _field(prompt, 'Career goal', 'professional development')
+    skills = [skill.strip() for skill in _field(prompt, 'New skills').split(',') if skill.strip()]
+    return {
+        'post_ideas': [{'topic': f"Progress toward {goal}", 'draft': f"Sharing what I have learned on the way to {goal}.",
+                        'hashtags': ['learning', 'career']}],
+        'profile_summary': f"Student working toward {goal}.",
+        'skills_to_add': skills or rng.sample(_TOPICS, 5),
+    }
+
+
+def _task_linkedin_post(prompt: str, rng: random.Random) -> Dict:
+    task = _field(prompt, 'Task', 'a milestone')
+    return {
+        'post_content': f"I just completed {task}. The biggest lesson was consistency. What are you learning this month?",
+        'hashtags': ['learning', 'growth', rng.choice(_TOPICS).replace(' ', '')],
+        'suggested_image': 'A screenshot of the finished work',
+    }
+
+
+def _encouragement(prompt: str, rng: random.Random) -> str:
+    item = re.search(r'just completed:\s*(.*?)\s*\(', prompt)
+    return _encouragement_message(item.group(1) if item else 'that milestone', rng)
+
+
+def _encouragement_message(name: str, rng: random.Random) -> str:
+    return f"Well done finishing {name}. {rng.choice(['Keep the momentum.', 'Each step compounds.', 'On to the next one.'])}"
+
+
+def _encouragement_batch(prompt: str, rng: random.Random) -> Dict:
+    items = re.findall(r'^\[(\w+)\] Completed:\s*(.*?)\s*\(', prompt, re.M)
+    return {'messages': [
+        {'id': request_id, 'message': _encouragement_message(name, rng)}
+        for request_id, name in items
+    ]}
+
+
+def _conversation_summary(prompt: str, rng: random.Random) -> Dict:
+    previous = _field(prompt, 'Current summary')
+    asks = re.findall(r'^User:\s*(.*)', prompt, re.M)
+    parts = ([previous] if previous and previous != '(empty)' else []) + [f"The student said: {ask[:80]}" for ask in asks]
+    return {'summary': ' '.join(parts)[-800:]}
+
+
+_BUILDERS = {
+    'ProfileAnalysis': _profile_analysis,
+    'Roadmap': _roadmap,
+    'MonthPlan': _month_plan,
+    'ChatReply': _chat_reply,
+    'ResumeBullets': _resume_bullets,
+    'LinkedInContent': _linkedin_content,
+    'TaskLinkedInPost': _task_linkedin_post,
+    'EncouragementBatch': _encouragement_batch,
+    'ConversationSummary': _conversation_summary,
+}
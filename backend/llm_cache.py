@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# Default time-to-live (seconds) per GeminiService / RoadmapAssistant method.
+# A TTL of 0 disables caching for that method.
+DEFAULT_TTLS = {
+    'analyze_student_profile': 7 * 24 * 3600,
+    'generate_growth_path': 24 * 3600,
+    'generate_single_month': 6 * 3600,
+    'generate_resume_bullets': 7 * 24 * 3600,
+    'generate_linkedin_content': 24 * 3600,
+    'generate_task_linkedin_post': 24 * 3600,
+    'generate_encouragement': 3600,
+    # Batch prompts never repeat; messages are cached per item instead
+    'generate_encouragement_batch': 0,
+    'chat': 600,
+    'summarize_conversation': 0,
+}
+DEFAULT_TTL = 3600
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Collapse whitespace so prompts that only differ in indentation share a key
+    """
+    return ' '.join(prompt.split())
+
+
+def make_cache_key(model_name: str, prompt: str, config: Optional[Dict] = None) -> str:
+    """
+    Build a stable key from model name, normalized prompt and generation config
+    """
+    payload = json.dumps({
+        'model': model_name,
+        'prompt': normalize_prompt(prompt),
+        'config': config or {},
+    }, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-level cache for model responses: an in-memory LRU in front of a
+    SQLite store that is shared by every worker process on the host.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_items: int = 512,
+                 ttls: Optional[Dict[str, int]] = None, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.max_memory_items = max_memory_items
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+
+        # key -> (expires_at, serialized value); values are stored serialized so
+        # callers can never mutate a cached result in place
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._stats = {}
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def ttl_for(self, method: str) -> int:
+        if not self.enabled:
+            return 0
+        return self.ttls.get(method, DEFAULT_TTL)
+
+    def get(self, method: str, key: str) -> Any:
+        """
+        Return the cached value, or None on a miss
+        """
+        if self.ttl_for(method) <= 0:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, serialized = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._count(method, 'memory_hits')
+                    return json.loads(serialized)
+                del self._memory[key]
+
+            row = self._disk_get(key, now)
+            if row is not None:
+                self._memory_put(key, row[0], row[1])
+                self._count(method, 'disk_hits')
+                return json.loads(row[1])
+
+            self._count(method, 'misses')
+            return None
+
+    def set(self, method: str, key: str, value: Any) -> None:
+        ttl = self.ttl_for(method)
+        if ttl <= 0 or value is None:
+            return
+
+        try:
+            serialized = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            print(f"Error serializing cache value for {method}: {e}")
+            return
+
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._memory_put(key, expires_at, serialized)
+            self._disk_put(key, method, expires_at, serialized)
+            self._count(method, 'stores')
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+            conn = self._connection()
+            if conn is not None:
+                try:
+                    conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Error invalidating cache entry: {e}")
+
+    def purge_expired(self) -> int:
+        """
+        Drop expired rows from the SQLite store, returns the number removed
+        """
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return 0
+            try:
+                cursor = conn.execute('DELETE FROM llm_cache WHERE expires_at <= ?', (time.time(),))
+                conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                print(f"Error purging cache: {e}")
+                return 0
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {method: dict(counters) for method, counters in self._stats.items()}
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _count(self, method: str, counter: str) -> None:
+        counters = self._stats.setdefault(method, {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0})
+        counters[counter] += 1
+
+    def _memory_put(self, key: str, expires_at: float, serialized: str) -> None:
+        self._memory[key] = (expires_at, serialized)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _connection(self):
+        if not self.path:
+            return None
+        # Re-open after fork so Gunicorn workers never share a handle
+        if self._conn is None or self._conn_pid != os.getpid():
+            try:
+                self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        method TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                self._conn.commit()
+                self._conn_pid = os.getpid()
+            except sqlite3.Error as e:
+                print(f"Error opening response cache at {self.path}: {e}")
+                self._conn = None
+                self.path = None
+        return self._conn
+
+    def _disk_get(self, key: str, now: float):
+        conn = self._connection()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                'SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading response cache: {e}")
+            return None
+        if not row or row[1] <= now:
+            return None
+        return row[1], row[0]
+
+    def _disk_put(self, key: str, method: str, expires_at: float, serialized: str) -> None:
+        conn = self._connection()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, method, value, expires_at) VALUES (?, ?, ?, ?)',
+                (key, method, serialized, expires_at)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing response cache: {e}")
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Process-wide cache shared by GeminiService and RoadmapAssistant,
+    configured from LLM_CACHE_* environment variables
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            ttls = {}
+            for method in DEFAULT_TTLS:
+                value = os.getenv(f'LLM_CACHE_TTL_{method.upper()}')
+                if value is not None:
+                    ttls[method] = int(value)
+            enabled = os.getenv('LLM_CACHE_ENABLED', '1') != '0'
+            _shared_cache = ResponseCache(
+                path=(os.getenv('LLM_CACHE_PATH', 'llm_cache.db') or None) if enabled else None,
+                max_memory_items=int(os.getenv('LLM_CACHE_MEMORY_ITEMS', '512')),
+                ttls=ttls,
+                enabled=enabled
+            )
+        return _shared_cache
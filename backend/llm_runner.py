@@ -0,0 +1,46 @@
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Optional
+
+
+class LLMRunner:
+    """
+    Owns a background asyncio event loop so sync Flask views can hand model
+    calls to AsyncGeminiService / AsyncRoadmapAssistant. All calls from every
+    request thread share one loop, one connection pool and one concurrency limit.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # Gunicorn forks workers after import; each worker needs its own loop thread
+            if self._loop is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='llm-event-loop',
+                    daemon=True
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._loop
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the shared loop and block the calling thread for its result
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result(timeout)
+
+
+llm_runner = LLMRunner()
+
+
+def run_llm(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    return llm_runner.run(coro, timeout)
@@ -0,0 +1,321 @@
+"""
+End-to-end load test for the student journey API.
+
+Each simulated user walks the same path the frontend does:
+register -> onboard -> generate growth path -> poll current month ->
+update progress -> resume / LinkedIn -> chat
+
+By default the app runs in-process against a throwaway SQLite database with
+the fake model backend (LLM_BACKEND=fake), so no quota is spent and results
+reflect the Flask/SQLite stack. Pass --url to drive a running server instead.
+
+    python loadtest.py --users 50 --concurrency 10 --months 12 --output run.json
+    python loadtest.py --users 50 --concurrency 10 --months 12 --compare run.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Order in which steps are reported
+STEPS = ['register', 'onboard', 'generate_growth_path', 'current_month', 'progress_update',
+         'progress_summary', 'resume', 'linkedin', 'linkedin_post', 'chat']
+
+CHAT_MESSAGES = [
+    "Can you explain why this month focuses on these courses?",
+    "I have exams next week, can we slow down a bit?",
+    "I'd like more hands-on projects please",
+    "What should I prioritise this week?",
+]
+
+
+# ============================================================================
+# TRANSPORTS
+# ============================================================================
+
+class InProcessTransport:
+    """
+    Runs the Flask app in this process with the fake model backend and a
+    temporary database. Environment must be set before app is imported.
+    """
+
+    def __init__(self, fake_latency_ms: Optional[float] = None):
+        self.workdir = tempfile.mkdtemp(prefix='loadtest_')
+        os.environ.setdefault('LLM_BACKEND', 'fake')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(self.workdir, 'loadtest.db')}"
+        os.environ['LLM_CACHE_PATH'] = os.path.join(self.workdir, 'llm_cache.db')
+        os.environ['RATE_LIMIT_PATH'] = os.path.join(self.workdir, 'rate_limits.db')
+        if fake_latency_ms is not None:
+            os.environ['FAKE_LLM_LATENCY_MS'] = str(fake_latency_ms)
+
+        import app as app_module
+        self.app = app_module.app
+        with self.app.app_context():
+            app_module.run_migrations()
+        self.app.db_initialized = True
+
+    def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Tuple[int, Dict]:
+        client = self.app.test_client()
+        response = client.open(path, method=method, json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+class HttpTransport:
+    """
+    Drives an already running server over HTTP (stdlib only)
+    """
+
+    def __init__(self, base_url: str, timeout: float = 300):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Tuple[int, Dict]:
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, _decode(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, _decode(e.read())
+
+
+def _decode(body: bytes) -> Dict:
+    try:
+        return json.loads(body or b'{}')
+    except ValueError:
+        return {}
+
+
+# ============================================================================
+# JOURNEY
+# ============================================================================
+
+class Recorder:
+    """Thread-safe collection of (step, latency, ok) samples"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+
+    def timed(self, transport, step: str, method: str, path: str, payload: Optional[Dict] = None,
+              expect: Tuple[int, ...] = (200, 201)) -> Optional[Dict]:
+        started = time.perf_counter()
+        try:
+            status, body = transport.request(method, path, payload)
+        except Exception as e:
+            print(f"Error in {step}: {e}")
+            status, body = 0, {}
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[step].append(elapsed)
+            if status not in expect:
+                self.errors[step] += 1
+        return body if status in expect else None
+
+
+def run_journey(transport, recorder: Recorder, index: int, run_id: str, months: int,
+                progress_updates: int, rng: random.Random) -> bool:
+    """One simulated user end to end; returns False if it had to stop early"""
+    body = recorder.timed(transport, 'register', 'POST', '/api/v1/users/register', {
+        'email': f"loadtest-{run_id}-{index}@example.com",
+        'name': f"Load Test {index}"
+    })
+    if not body:
+        return False
+    user_id = body['user']['id']
+
+    if not recorder.timed(transport, 'onboard', 'POST', '/api/v1/users/onboard', {
+        'user_id': user_id,
+        'major': rng.choice(['Computer Science', 'Economics', 'Mechanical Engineering']),
+        'university': 'State University',
+        'career_aspirations': rng.choice(['Data Scientist', 'Backend Engineer', 'Product Analyst']),
+        'current_skills': rng.sample(['Python', 'SQL', 'Excel', 'Java', 'Statistics'], 2),
+        'experience_level': 'beginner',
+        'target_industries': ['Technology'],
+        'time_commitment': '10 hours/week'
+    }):
+        return False
+
+    if not recorder.timed(transport, 'generate_growth_path', 'POST', '/api/v1/growth-path/generate', {
+        'user_id': user_id,
+        'timeline_months': months
+    }):
+        return False
+
+    month = recorder.timed(transport, 'current_month', 'GET', f'/api/v1/roadmap/current-month/{user_id}')
+    tasks = (month or {}).get('tasks', [])
+
+    completed = []
+    for task in tasks[:progress_updates]:
+        if recorder.timed(transport, 'progress_update', 'POST', '/api/v1/progress/update', {
+            'user_id': user_id,
+            'item_id': task['item_id'],
+            'status': 'completed'
+        }):
+            completed.append(task['item_id'])
+        recorder.timed(transport, 'current_month', 'GET', f'/api/v1/roadmap/current-month/{user_id}')
+
+    recorder.timed(transport, 'progress_summary', 'GET', f'/api/v1/progress/{user_id}/summary')
+    recorder.timed(transport, 'resume', 'GET', f'/api/v1/profile/{user_id}/resume')
+    recorder.timed(transport, 'linkedin', 'GET', f'/api/v1/profile/{user_id}/linkedin')
+    if completed:
+        recorder.timed(transport, 'linkedin_post', 'POST', '/api/v1/linkedin/generate-post', {
+            'user_id': user_id,
+            'item_id': completed[0]
+        })
+    recorder.timed(transport, 'chat', 'POST', '/api/v1/roadmap/chat', {
+        'user_id': user_id,
+        'message': rng.choice(CHAT_MESSAGES)
+    })
+    return True
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(recorder: Recorder, wall_seconds: float) -> Dict:
+    endpoints = {}
+    total_requests = 0
+    for step in STEPS:
+        values = sorted(recorder.samples[step])
+        if not values:
+            continue
+        total_requests += len(values)
+        endpoints[step] = {
+            'count': len(values),
+            'errors': recorder.errors[step],
+            'throughput_rps': round(len(values) / wall_seconds, 2) if wall_seconds else 0,
+            'mean_ms': round(sum(values) / len(values) * 1000, 2),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2)
+        }
+    return {
+        'wall_seconds': round(wall_seconds, 3),
+        'total_requests': total_requests,
+        'throughput_rps': round(total_requests / wall_seconds, 2) if wall_seconds else 0,
+        'errors': sum(recorder.errors.values()),
+        'endpoints': endpoints
+    }
+
+
+def print_report(results: Dict) -> None:
+    summary = results['summary']
+    print(f"\n{'endpoint':<22}{'count':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, row in summary['endpoints'].items():
+        print(f"{step:<22}{row['count']:>7}{row['errors']:>6}{row['throughput_rps']:>9}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    print(f"\n{summary['total_requests']} requests in {summary['wall_seconds']}s "
+          f"({summary['throughput_rps']} req/s), {results['journeys_completed']}/{results['config']['users']} "
+          f"journeys completed, {summary['errors']} errors")
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Endpoints whose p95 grew by more than threshold (fraction) over the baseline"""
+    regressions = []
+    print(f"\n{'endpoint':<22}{'base p95':>10}{'now p95':>10}{'change':>9}")
+    for step, row in results['summary']['endpoints'].items():
+        base = baseline.get('summary', {}).get('endpoints', {}).get(step)
+        if not base:
+            continue
+        change = (row['p95_ms'] - base['p95_ms']) / base['p95_ms'] if base['p95_ms'] else 0
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{step:<22}{base['p95_ms']:>10}{row['p95_ms']:>10}{change:>+9.1%}{flag}")
+        if flag:
+            regressions.append(step)
+    return regressions
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Load test the student journey API')
+    parser.add_argument('--users', type=int, default=20, help='simulated users (journeys)')
+    parser.add_argument('--concurrency', type=int, default=5, help='journeys running at once')
+    parser.add_argument('--months', type=int, default=12, help='roadmap length requested per user')
+    parser.add_argument('--progress-updates', type=int, default=3, help='tasks completed per user')
+    parser.add_argument('--url', help='base URL of a running server; default runs the app in-process')
+    parser.add_argument('--fake-latency-ms', type=float, help='override FAKE_LLM_LATENCY_MS (in-process only)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON to compare p95 against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 growth treated as a regression')
+    args = parser.parse_args(argv)
+
+    transport = HttpTransport(args.url) if args.url else InProcessTransport(args.fake_latency_ms)
+    recorder = Recorder()
+    run_id = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_journey, transport, recorder, index, run_id, args.months,
+                        args.progress_updates, random.Random(args.seed + index))
+            for index in range(args.users)
+        ]
+        completed = sum(1 for future in futures if future.result())
+    wall_seconds = time.perf_counter() - started
+
+    results = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'config': {
+            'users': args.users,
+            'concurrency': args.concurrency,
+            'months': args.months,
+            'progress_updates': args.progress_updates,
+            'target': args.url or 'in-process',
+            'llm_backend': os.getenv('LLM_BACKEND', 'gemini') if args.url is None else 'server',
+            'fake_latency_ms': os.getenv('FAKE_LLM_LATENCY_MS'),
+            'seed': args.seed
+        },
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'journeys_completed': completed,
+        'summary': summarize(recorder, wall_seconds)
+    }
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"p95 regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
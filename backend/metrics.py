@@ -0,0 +1,230 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Metrics are kept per process; with several Gunicorn workers each scrape
+# sees the worker that served it, so scrape workers individually or sum them.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels) -> None:
+        # For mirroring a monotonic count that another subsystem already keeps
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._values[key] = state
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state['counts']):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {_format_value(state["sum"])}')
+                lines.append(f'{self.name}_count{labels} {state["count"]}')
+        return lines
+
+    def snapshot(self, **labels) -> Optional[Dict]:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return None if state is None else {'counts': list(state['counts']), 'sum': state['sum'], 'count': state['count']}
+
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus text-format registry. Collectors are callbacks that
+    refresh gauges from other subsystems (cache, single-flight, ...) at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, fn: Callable[[], None]) -> Callable[[], None]:
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics)
+        for collect in collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Error in metrics collector: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# ----------------------------------------------------------------------------
+# Model call metrics
+# ----------------------------------------------------------------------------
+
+llm_call_seconds = registry.histogram(
+    'llm_call_duration_seconds', 'Latency of model calls that reached the backend',
+    ('method', 'model', 'outcome'))
+llm_prompt_chars = registry.histogram(
+    'llm_prompt_chars', 'Prompt size in characters', ('method',), buckets=SIZE_BUCKETS)
+llm_response_chars = registry.histogram(
+    'llm_response_chars', 'Response size in characters', ('method',), buckets=SIZE_BUCKETS)
+llm_tokens = registry.counter(
+    'llm_tokens_total', 'Tokens reported by response usage metadata', ('method', 'kind'))
+llm_errors = registry.counter(
+    'llm_errors_total', 'Model calls that raised, by exception type', ('method', 'error'))
+llm_fallbacks = registry.counter(
+    'llm_fallbacks_total', 'Calls answered with canned fallback data', ('method',))
+llm_slot_wait_seconds = registry.histogram(
+    'llm_slot_wait_seconds', 'Time async calls waited for a concurrency slot', ('method',))
+llm_stream_first_item_seconds = registry.histogram(
+    'llm_stream_first_item_seconds', 'Time from request to first complete streamed item', ('method',))
+llm_cache_requests = registry.counter(
+    'llm_cache_requests_total', 'Response cache lookups', ('method', 'result'))
+llm_cache_skips = registry.counter(
+    'llm_cache_skips_total', 'Responses left uncached because a latency-fallback tier answered', ('method',))
+
+# ----------------------------------------------------------------------------
+# HTTP metrics
+# ----------------------------------------------------------------------------
+
+http_request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Flask request latency', ('route', 'method', 'status'))
+
+
+def record_model_call(method: str, model: str, prompt: str, started: float,
+                      response=None, error: Optional[BaseException] = None) -> None:
+    """
+    Record latency, sizes, token usage and errors for one model round trip
+    """
+    elapsed = time.perf_counter() - started
+    llm_call_seconds.observe(elapsed, method=method, model=model, outcome='error' if error else 'ok')
+    llm_prompt_chars.observe(len(prompt or ''), method=method)
+
+    if error is not None:
+        llm_errors.inc(method=method, error=type(error).__name__)
+        return
+
+    text = getattr(response, 'text', None) or ''
+    llm_response_chars.observe(len(text), method=method)
+    record_token_usage(method, getattr(response, 'usage_metadata', None))
+
+
+def record_token_usage(method: str, usage) -> None:
+    if usage is None:
+        return
+    for kind, attribute in (('prompt', 'prompt_token_count'),
+                            ('response', 'candidates_token_count'),
+                            ('total', 'total_token_count')):
+        count = getattr(usage, attribute, None)
+        if count:
+            llm_tokens.inc(count, method=method, kind=kind)
@@ -0,0 +1,186 @@
+"""
+Versioned, in-place schema migrations. Applied versions are recorded in the
+schema_migrations table; each pending migration runs in its own transaction.
+
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # list applied and pending versions
+"""
+import argparse
+import json
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from models import (db, User, StudentProfile, GrowthPath, GrowthPathPhase, ProgressTracker, ProfessionalProfile,
+                    SimulatedTrend, RoadmapConversation, UserPreferences, BackgroundJob, StagedMonth, SchedulerLease,
+                    ConversationMemory, ProgressAggregate)
+from progress_stats import rebuild_aggregates
+
+MIGRATIONS = []
+
+
+def migration(version: int, name: str):
+    """
+    Register fn(conn) as migration version. Migrations must be idempotent:
+    two workers starting together may both run one before either records it.
+    """
+    def decorator(fn: Callable):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return fn
+    return decorator
+
+
+def _ensure_version_table(conn) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """))
+
+
+def applied_versions(engine) -> Dict[int, str]:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        rows = conn.execute(text('SELECT version, name FROM schema_migrations')).fetchall()
+    return {version: name for version, name in rows}
+
+
+def run_migrations(engine=None) -> List[int]:
+    """
+    Apply pending migrations in version order, returns the versions applied
+    """
+    engine = engine or db.engine
+    applied = applied_versions(engine)
+    ran = []
+    for version, name, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :at)'),
+                             {'v': version, 'n': name, 'at': datetime.utcnow()})
+        except IntegrityError:
+            # Another worker recorded it first
+            continue
+        print(f"Applied migration {version}: {name}")
+        ran.append(version)
+    return ran
+
+
+def _add_column(conn, model, column_name: str, default_sql: str) -> None:
+    table = model.__table__
+    if column_name in {col['name'] for col in inspect(conn).get_columns(table.name)}:
+        return
+    column_type = table.columns[column_name].type.compile(dialect=conn.dialect)
+    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column_name} {column_type} DEFAULT {default_sql}'))
+
+
+def _create_index(conn, model, name: str) -> None:
+    index = next(index for index in model.__table__.indexes if index.name == name)
+    if index.unique:
+        columns = ', '.join(col.name for col in index.columns)
+        duplicates = conn.execute(text(
+            f'SELECT {columns} FROM {model.__table__.name} GROUP BY {columns} HAVING COUNT(*) > 1 LIMIT 5'
+        )).fetchall()
+        if duplicates:
+            # Never delete rows to make an index fit; index them non-uniquely and say so
+            print(f"WARNING: duplicate {model.__table__.name} rows for {[tuple(row) for row in duplicates]}; "
+                  f"creating {name} without UNIQUE. Merge the duplicates and recreate it.")
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {model.__table__.name} ({columns})'))
+            return
+    index.create(conn, checkfirst=True)
+
+
+# ============================================================================
+# MIGRATIONS
+# ============================================================================
+
+@migration(1, 'baseline schema')
+def baseline(conn):
+    # Tables as they stood when versioning was introduced; existing databases
+    # keep their tables and only gain the ones they are missing
+    tables = [User, StudentProfile, GrowthPath, ProgressTracker, ProfessionalProfile, SimulatedTrend,
+              RoadmapConversation, UserPreferences, BackgroundJob, StagedMonth, SchedulerLease, ConversationMemory]
+    db.metadata.create_all(conn, tables=[model.__table__ for model in tables])
+
+
+@migration(2, 'provisional result flags')
+def provisional_flags(conn):
+    _add_column(conn, StudentProfile, 'analysis_provisional', 'FALSE')
+    _add_column(conn, ProgressTracker, 'encouragement_provisional', 'FALSE')
+    _add_column(conn, ProfessionalProfile, 'linkedin_provisional', 'FALSE')
+
+
+@migration(3, 'indexes for per-user lookups')
+def per_user_indexes(conn):
+    _create_index(conn, ProgressTracker, 'ix_progress_tracker_user_phase')
+    _create_index(conn, ProgressTracker, 'ix_progress_tracker_user_item')
+    _create_index(conn, ProgressTracker, 'ix_progress_tracker_user_status')
+    _create_index(conn, GrowthPath, 'ix_growth_paths_user_active')
+    _create_index(conn, RoadmapConversation, 'ix_roadmap_conversations_user_id_id')
+    _create_index(conn, StudentProfile, 'uq_student_profiles_user_id')
+    _create_index(conn, ProfessionalProfile, 'uq_professional_profiles_user_id')
+
+
+@migration(4, 'progress aggregates')
+def progress_aggregates(conn):
+    ProgressAggregate.__table__.create(conn, checkfirst=True)
+    rebuild_aggregates(conn)
+
+
+@migration(5, 'roadmap phases as rows')
+def roadmap_phase_rows(conn):
+    GrowthPathPhase.__table__.create(conn, checkfirst=True)
+    paths, phases = GrowthPath.__table__, GrowthPathPhase.__table__
+    # Only blobs that still hold their phases; each path is split and
+    # rewritten in the same transaction, so a rerun skips finished ones
+    blobs = conn.execute(db.select(paths.c.id, paths.c.roadmap_data)
+                         .where(paths.c.roadmap_data.like('%"phases"%'))).fetchall()
+    for growth_path_id, roadmap_data in blobs:
+        try:
+            roadmap = json.loads(roadmap_data)
+        except ValueError:
+            print(f"WARNING: growth path {growth_path_id} has unreadable roadmap_data; left as is")
+            continue
+        rows = {}  # a repeated month keeps its first phase, the one get_current_month used to serve
+        for phase in roadmap.pop('phases', None) or []:
+            rows.setdefault(phase.get('phase', 1), phase)
+        if rows:
+            conn.execute(phases.insert(), [{'growth_path_id': growth_path_id, 'month': month,
+                                            'phase_data': json.dumps(phase)} for month, phase in rows.items()])
+        conn.execute(paths.update().where(paths.c.id == growth_path_id).values(roadmap_data=json.dumps(roadmap)))
+
+
+@migration(6, 'staged months per growth path')
+def staged_month_growth_path(conn):
+    # Rows staged before this have no path and are dropped as stale when next looked up
+    _add_column(conn, StagedMonth, 'growth_path_id', 'NULL')
+
+
+@migration(7, 'roadmap extender backoff')
+def extender_backoff(conn):
+    _add_column(conn, GrowthPath, 'extend_failures', '0')
+    _add_column(conn, GrowthPath, 'extend_retry_at', 'NULL')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply or list schema migrations')
+    parser.add_argument('command', nargs='?', default='upgrade', choices=('upgrade', 'status'))
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        if args.command == 'status':
+            applied = applied_versions(db.engine)
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:>4}  {'applied' if version in applied else 'pending':8} {name}")
+        else:
+            ran = run_migrations()
+            print(f"Applied {len(ran)} migration(s)" if ran else "Schema is up to date")
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from metrics import registry
+
+# Maps each model operation to a tier with a p95 latency budget. When an
+# operation's recent p95 on its tier is over budget it is sent to the next
+# faster tier; once those slow samples age out of the window it goes back.
+
+# Strongest first; falling back moves to the right
+DEFAULT_TIERS = 'quality=gemini-2.5-flash,standard=gemini-2.0-flash,fast=gemini-2.0-flash-lite'
+
+# operation -> (tier, p95 budget in seconds)
+DEFAULT_ROUTES = {
+    'analyze_student_profile': ('standard', 20.0),
+    'generate_growth_path': ('standard', 90.0),
+    'stream_growth_path': ('standard', 90.0),
+    'generate_single_month': ('standard', 20.0),
+    'chat': ('standard', 8.0),
+    'generate_encouragement_batch': ('fast', 4.0),
+    'generate_resume_bullets': ('fast', 5.0),
+    'generate_linkedin_content': ('fast', 10.0),
+    'generate_task_linkedin_post': ('fast', 6.0),
+    'summarize_conversation': ('fast', 10.0),
+}
+DEFAULT_ROUTE = ('standard', 30.0)
+
+route_decisions = registry.counter(
+    'llm_route_decisions_total', 'Model tier chosen per call', ('method', 'tier', 'reason'))
+route_p95_seconds = registry.gauge(
+    'llm_route_p95_seconds', 'Recent p95 latency per operation and tier (unset below the sample minimum)',
+    ('method', 'tier'))
+route_budget_seconds = registry.gauge(
+    'llm_route_budget_seconds', 'p95 latency budget per operation', ('method',))
+
+
+def parse_tiers(spec: str) -> List[Tuple[str, str]]:
+    """
+    'name=model,name=model' -> [(name, model)], in order
+    """
+    tiers = []
+    for part in spec.split(','):
+        name, _, model = part.strip().partition('=')
+        if name and model:
+            tiers.append((name.strip(), model.strip()))
+    return tiers
+
+
+class ModelRouter:
+    """
+    Picks the model for each call and keeps a rolling latency window per
+    (operation, tier). A tier's p95 only counts once it has min_samples
+    samples from the last window_seconds.
+    """
+
+    def __init__(self, tiers: List[Tuple[str, str]], routes: Optional[Dict[str, Tuple[str, float]]] = None,
+                 window_seconds: float = 300, min_samples: int = 20, max_samples: int = 200):
+        self.tiers = tiers
+        self.models = dict(tiers)
+        self.routes = dict(DEFAULT_ROUTES)
+        if routes:
+            self.routes.update(routes)
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+        for method, (_, budget) in self.routes.items():
+            route_budget_seconds.set(budget, method=method)
+
+    def route(self, method: str) -> str:
+        """
+        Model to use for the next call of method
+        """
+        tier, chosen = self._choose(method)
+        route_decisions.inc(method=method, tier=chosen, reason='primary' if chosen == tier else 'latency_fallback')
+        return self.models[chosen]
+
+    def is_primary(self, method: str, model: str) -> bool:
+        """
+        Whether model is method's configured tier rather than a latency fallback
+        """
+        return self.models[self._configured(method)[0]] == model
+
+    def _configured(self, method: str) -> Tuple[str, float]:
+        """
+        (tier, budget) for method, with an unknown tier replaced by the default
+        """
+        tier, budget = self.routes.get(method, DEFAULT_ROUTE)
+        names = [name for name, _ in self.tiers]
+        if tier not in names:
+            tier = DEFAULT_ROUTE[0] if DEFAULT_ROUTE[0] in names else names[0]
+        return tier, budget
+
+    def _choose(self, method: str) -> Tuple[str, str]:
+        """
+        (configured tier, chosen tier): the first tier from the configured one
+        down whose p95 is within budget or unknown; the fastest tier otherwise
+        """
+        tier, budget = self._configured(method)
+        names = [name for name, _ in self.tiers]
+        for name in names[names.index(tier):]:
+            p95 = self.p95(method, name)
+            if p95 is None or p95 <= budget:
+                return tier, name
+        return tier, names[-1]
+
+    def observe(self, method: str, model: str, seconds: float) -> None:
+        """
+        Record one call's latency (errors and timeouts included)
+        """
+        tier = self._tier_for(model)
+        if tier is None:
+            return
+        now = time.time()
+        with self._lock:
+            samples = self._samples.setdefault((method, tier), deque(maxlen=self.max_samples))
+            samples.append((now, seconds))
+        p95 = self.p95(method, tier)
+        if p95 is not None:
+            route_p95_seconds.set(p95, method=method, tier=tier)
+
+    def p95(self, method: str, tier: str) -> Optional[float]:
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            values = sorted(seconds for at, seconds in self._samples.get((method, tier), ()) if at >= cutoff)
+        if len(values) < self.min_samples:
+            return None
+        return values[max(0, -(-len(values) * 95 // 100) - 1)]
+
+    def _tier_for(self, model: str) -> Optional[str]:
+        for name, tier_model in self.tiers:
+            if tier_model == model:
+                return name
+        return None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Configured tier, budget, current choice and p95 per operation
+        """
+        result = {}
+        for method, (_, budget) in sorted(self.routes.items()):
+            tier, chosen = self._choose(method)
+            result[method] = {'tier': tier, 'budget_seconds': budget, 'current_tier': chosen,
+                              'p95_seconds': self.p95(method, tier)}
+        return result
+
+
+_shared_router = None
+_shared_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """
+    Process-wide router configured from MODEL_* environment variables.
+    MODEL_ROUTE_<OPERATION>=tier:budget_seconds overrides one operation.
+    """
+    global _shared_router
+    with _shared_router_lock:
+        if _shared_router is None:
+            routes = {}
+            for method in DEFAULT_ROUTES:
+                value = os.getenv(f'MODEL_ROUTE_{method.upper()}')
+                if value:
+                    tier, _, budget = value.partition(':')
+                    routes[method] = (tier.strip(), float(budget) if budget else DEFAULT_ROUTES[method][1])
+            _shared_router = ModelRouter(
+                parse_tiers(os.getenv('MODEL_TIERS', DEFAULT_TIERS)),
+                routes,
+                window_seconds=float(os.getenv('MODEL_ROUTE_WINDOW_SECONDS', '300')),
+                min_samples=int(os.getenv('MODEL_ROUTE_MIN_SAMPLES', '20'))
+            )
+        return _shared_router
@@ -47,6 +47,7 @@ class StudentProfile(db.Model):
     preferred_content_types = db.Column(db.Text)  # JSON string
     time_commitment = db.Column(db.String(50))
     analysis_data = db.Column(db.Text)  # JSON string - Gemini analysis results
+    analysis_provisional = db.Column(db.Boolean, default=False)  # placeholder until the backfill job lands
     
     # New Fields for Long-term Planning
     profile_photo = db.Column(db.Text)  # Base64 string or URL
@@ -62,6 +63,10 @@ class StudentProfile(db.Model):
 
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('uq_student_profiles_user_id', 'user_id', unique=True),
+    )
+
     def get_skills(self):
         return json.loads(self.current_skills) if self.current_skills else []
 
@@ -115,6 +120,7 @@ class StudentProfile(db.Model):
             'github_url': self.github_url,
             'portfolio_url': self.portfolio_url,
             'analysis': self.get_analysis(),
+            'analysis_provisional': bool(self.analysis_provisional),
             'updated_at': self.updated_at.isoformat()
         }
 
@@ -125,16 +131,60 @@ class GrowthPath(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     phase = db.Column(db.Integer, nullable=False)
-    roadmap_data = db.Column(db.Text, nullable=False)  # JSON string
+    roadmap_data = db.Column(db.Text, nullable=False, default='{}')  # JSON string - roadmap minus its phases
     generated_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     current_month = db.Column(db.Integer, default=1)  # User's active month in the roadmap
+    extend_failures = db.Column(db.Integer, default=0)  # consecutive extender attempts that added nothing
+    extend_retry_at = db.Column(db.DateTime)  # the extender leaves the path alone until then
+
+    # One row per month; dynamic so appending or reading one month never loads the rest
+    phases = db.relationship('GrowthPathPhase', backref='growth_path', lazy='dynamic',
+                             order_by='GrowthPathPhase.month', cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.Index('ix_growth_paths_user_active', 'user_id', 'is_active'),
+    )
 
     def get_roadmap(self):
-        return json.loads(self.roadmap_data) if self.roadmap_data else {}
+        roadmap = json.loads(self.roadmap_data) if self.roadmap_data else {}
+        roadmap['phases'] = [row.get_phase_data() for row in self.phases]
+        return roadmap
 
     def set_roadmap(self, roadmap_dict):
-        self.roadmap_data = json.dumps(roadmap_dict)
+        # Replaces every phase; later months are added with append_phases.
+        # Returns the phases stored.
+        self.roadmap_data = json.dumps({k: v for k, v in roadmap_dict.items() if k != 'phases'})
+        self.phases = []
+        return self.append_phases(roadmap_dict.get('phases', []))
+
+    def append_phases(self, phases):
+        # A month the roadmap already has, or that repeats within phases, is
+        # skipped (the first one wins); returns the phases actually appended
+        months = {phase.get('phase', 1) for phase in phases}
+        taken = set()
+        if self.id is not None and months:
+            taken = {month for (month,) in self.phases.filter(GrowthPathPhase.month.in_(months))
+                     .with_entities(GrowthPathPhase.month)}
+        appended = []
+        for phase in phases:
+            month = phase.get('phase', 1)
+            if month in taken:
+                print(f"Skipping repeated month {month} for growth path {self.id}")
+                continue
+            taken.add(month)
+            row = GrowthPathPhase(month=month)
+            row.set_phase_data(phase)
+            self.phases.append(row)
+            appended.append(phase)
+        return appended
+
+    def get_phase(self, month):
+        row = self.phases.filter_by(month=month).first()
+        return row.get_phase_data() if row else None
+
+    def max_phase(self):
+        return self.phases.with_entities(db.func.max(GrowthPathPhase.month)).scalar() or 0
 
     def to_dict(self):
         return {
@@ -148,6 +198,34 @@ class GrowthPath(db.Model):
         }
 
 
+class GrowthPathPhase(db.Model):
+    """One month of a growth path's roadmap"""
+    __tablename__ = 'growth_path_phases'
+
+    id = db.Column(db.Integer, primary_key=True)
+    growth_path_id = db.Column(db.Integer, db.ForeignKey('growth_paths.id'), nullable=False)
+    month = db.Column(db.Integer, nullable=False)  # the phase's 'phase' number
+    phase_data = db.Column(db.Text, nullable=False)  # JSON string - one roadmap phase
+
+    __table_args__ = (
+        db.Index('uq_growth_path_phases_path_month', 'growth_path_id', 'month', unique=True),
+    )
+
+    def get_phase_data(self):
+        return json.loads(self.phase_data) if self.phase_data else {}
+
+    def set_phase_data(self, phase_dict):
+        self.phase_data = json.dumps(phase_dict)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'growth_path_id': self.growth_path_id,
+            'month': self.month,
+            'phase': self.get_phase_data()
+        }
+
+
 class ProgressTracker(db.Model):
     __tablename__ = 'progress_tracker'
 
@@ -160,9 +238,17 @@ class ProgressTracker(db.Model):
     completion_date = db.Column(db.DateTime)
     notes = db.Column(db.Text)
     encouragement_message = db.Column(db.Text)
+    encouragement_provisional = db.Column(db.Boolean, default=False)  # placeholder until the backfill job lands
     include_in_resume = db.Column(db.Boolean, default=False)  # User can select items for resume
     phase = db.Column(db.Integer, default=1)  # Which month/phase this task belongs to
 
+    # item_id comes from generated roadmaps and can repeat across months, so it is not unique
+    __table_args__ = (
+        db.Index('ix_progress_tracker_user_phase', 'user_id', 'phase'),
+        db.Index('ix_progress_tracker_user_item', 'user_id', 'item_id'),
+        db.Index('ix_progress_tracker_user_status', 'user_id', 'status'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -174,6 +260,7 @@ class ProgressTracker(db.Model):
             'completion_date': self.completion_date.isoformat() if self.completion_date else None,
             'notes': self.notes,
             'encouragement_message': self.encouragement_message,
+            'encouragement_provisional': bool(self.encouragement_provisional),
             'include_in_resume': self.include_in_resume,
             'phase': self.phase
         }
@@ -186,8 +273,13 @@ class ProfessionalProfile(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     resume_json = db.Column(db.Text)  # JSON string
     linkedin_suggestions = db.Column(db.Text)  # JSON string
+    linkedin_provisional = db.Column(db.Boolean, default=False)  # placeholder until the backfill job lands
     last_generated = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('uq_professional_profiles_user_id', 'user_id', unique=True),
+    )
+
     def get_resume(self):
         return json.loads(self.resume_json) if self.resume_json else {}
 
@@ -206,6 +298,7 @@ class ProfessionalProfile(db.Model):
             'user_id': self.user_id,
             'resume': self.get_resume(),
             'linkedin_suggestions': self.get_linkedin(),
+            'linkedin_provisional': bool(self.linkedin_provisional),
             'last_generated': self.last_generated.isoformat()
         }
 
@@ -243,6 +336,11 @@ class RoadmapConversation(db.Model):
     message = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Chat history is read in id order, which is also creation order
+    __table_args__ = (
+        db.Index('ix_roadmap_conversations_user_id_id', 'user_id', 'id'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -277,4 +375,147 @@ class UserPreferences(db.Model):
             'pace': self.pace,
             'focus_areas': self.get_focus_areas(),
             'updated_at': self.updated_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class BackgroundJob(db.Model):
+    """Durable work queue entry, picked up by jobs.JobWorker"""
+    __tablename__ = 'background_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    payload = db.Column(db.Text)  # JSON string
+    dedupe_key = db.Column(db.String(255))  # at most one unfinished job per key
+    status = db.Column(db.String(20), default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    result = db.Column(db.Text)  # JSON string
+    error = db.Column(db.Text)
+    locked_by = db.Column(db.String(100))
+    lease_expires_at = db.Column(db.DateTime)  # a running job past its lease is retried
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_background_jobs_status_run_after', 'status', 'run_after'),
+        db.Index('ix_background_jobs_dedupe_key', 'dedupe_key'),
+    )
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def set_payload(self, payload_dict):
+        self.payload = json.dumps(payload_dict)
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
+
+    def set_result(self, result_dict):
+        self.result = json.dumps(result_dict)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'user_id': self.user_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result': self.get_result(),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class StagedMonth(db.Model):
+    """Month plan generated ahead of unlock, served if preferences still match"""
+    __tablename__ = 'staged_months'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    growth_path_id = db.Column(db.Integer, db.ForeignKey('growth_paths.id'))  # roadmap it was generated for
+    month_data = db.Column(db.Text, nullable=False)  # JSON string - generate_single_month output
+    preferences_key = db.Column(db.String(255), nullable=False)  # preferences it was generated with
+    status = db.Column(db.String(20), default='ready')  # ready, consumed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', name='uq_staged_months_user_month'),
+    )
+
+    def get_month_data(self):
+        return json.loads(self.month_data) if self.month_data else {}
+
+    def set_month_data(self, month_dict):
+        self.month_data = json.dumps(month_dict)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'growth_path_id': self.growth_path_id,
+            'month': self.month,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class SchedulerLease(db.Model):
+    """Named lease so only one process at a time runs a periodic task"""
+    __tablename__ = 'scheduler_leases'
+
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class ConversationMemory(db.Model):
+    """Rolling summary of a user's older roadmap chat messages"""
+    __tablename__ = 'conversation_memories'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
+    summary = db.Column(db.Text, default='')
+    summarized_through_id = db.Column(db.Integer, default=0)  # last RoadmapConversation.id folded into summary
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'summary': self.summary,
+            'summarized_through_id': self.summarized_through_id,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class ProgressAggregate(db.Model):
+    """Task counts per user, month and item type, kept in step with progress_tracker (see progress_stats)"""
+    __tablename__ = 'progress_aggregates'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    phase = db.Column(db.Integer, nullable=False)
+    item_type = db.Column(db.String(50), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)  # includes statuses other than the three below
+    not_started = db.Column(db.Integer, nullable=False, default=0)
+    in_progress = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('uq_progress_aggregates_user_phase_type', 'user_id', 'phase', 'item_type', unique=True),
+    )
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'phase': self.phase,
+            'item_type': self.item_type,
+            'total': self.total,
+            'not_started': self.not_started,
+            'in_progress': self.in_progress,
+            'completed': self.completed
+        }
@@ -0,0 +1,281 @@
+"""
+Per-user progress counts. Reads come from the progress_aggregates table,
+which is kept in step with progress_tracker inside the same transaction:
+ORM inserts, deletes and status/phase changes are applied after each flush,
+and bulk Query.delete() calls are counted before they run. Bulk UPDATEs of
+tracker status or phase bypass this and must go through ORM objects; writers
+that insert rows with Core call apply_tracker_inserts.
+
+    python progress_stats.py verify [--user-id N]    # compare with progress_tracker
+    python progress_stats.py rebuild [--user-id N]   # recompute from progress_tracker
+"""
+import argparse
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import db, ProgressAggregate, ProgressTracker
+
+ITEM_TYPES = ('course', 'test', 'internship', 'certificate', 'project')
+STATUSES = ('not_started', 'in_progress', 'completed')
+COUNT_COLUMNS = ('total',) + STATUSES
+
+
+# ============================================================================
+# READS
+# ============================================================================
+
+def phase_counts(user_id: int, before: Optional[int] = None, phase: Optional[int] = None) -> Dict[int, Dict[str, int]]:
+    """
+    {phase: {'total', 'completed'}} for a user's phases that have tasks,
+    optionally only the phases below before or a single phase
+    """
+    query = db.session.query(ProgressAggregate.phase, db.func.sum(ProgressAggregate.total),
+                             db.func.sum(ProgressAggregate.completed)) \
+        .filter(ProgressAggregate.user_id == user_id)
+    if before is not None:
+        query = query.filter(ProgressAggregate.phase < before)
+    if phase is not None:
+        query = query.filter(ProgressAggregate.phase == phase)
+    rows = query.group_by(ProgressAggregate.phase).all()
+    return {phase: {'total': total or 0, 'completed': done or 0} for phase, total, done in rows if total}
+
+
+def get_completed_phases(user_id: int, current_month: int) -> List[Dict]:
+    """
+    Per-month completion summaries for the months before current_month
+    """
+    if current_month <= 1:
+        return []
+    counts = phase_counts(user_id, before=current_month)
+    completed_phases = []
+    for month in range(1, current_month):
+        month_counts = counts.get(month, {'total': 0, 'completed': 0})
+        completed_phases.append({
+            'month': month,
+            'summary': f"Completed {month_counts['completed']}/{month_counts['total']} tasks"
+        })
+    return completed_phases
+
+
+def month_completion_rate(user_id: int, month: int) -> float:
+    """
+    Share of a month's tasks that are completed (0 for a month without tasks)
+    """
+    counts = phase_counts(user_id, phase=month).get(month)
+    if not counts:
+        return 0
+    return counts['completed'] / counts['total']
+
+
+def progress_summary(user_id: int) -> Dict:
+    """
+    Task counts by status and completion by item type, in the
+    /progress/<user_id>/summary format (without current_month)
+    """
+    rows = ProgressAggregate.query.filter_by(user_id=user_id).all()
+
+    summary = {'by_type': {item_type: {'total': 0, 'completed': 0} for item_type in ITEM_TYPES}}
+    summary.update({column: 0 for column in COUNT_COLUMNS})
+    for row in rows:
+        for column in COUNT_COLUMNS:
+            summary[column] += getattr(row, column)
+        if row.item_type in summary['by_type']:
+            summary['by_type'][row.item_type]['total'] += row.total
+            summary['by_type'][row.item_type]['completed'] += row.completed
+    return summary
+
+
+# ============================================================================
+# MAINTENANCE
+# ============================================================================
+
+def _key(user_id, phase, item_type) -> Tuple:
+    return user_id, phase if phase is not None else 1, item_type
+
+
+def _count(deltas: Dict, key: Tuple, status: Optional[str], sign: int) -> None:
+    delta = deltas.setdefault(key, dict.fromkeys(COUNT_COLUMNS, 0))
+    delta['total'] += sign
+    status = status or 'not_started'
+    if status in STATUSES:
+        delta[status] += sign
+
+
+def _upsert_statement(dialect_name: str):
+    """
+    INSERT ... ON CONFLICT DO UPDATE adding each count, for one executemany
+    over all changed keys (SQLite and PostgreSQL share the syntax)
+    """
+    insert = postgresql_insert if dialect_name == 'postgresql' else sqlite_insert
+    table = ProgressAggregate.__table__
+    statement = insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.phase, table.c.item_type],
+        set_={column: table.c[column] + statement.excluded[column] for column in COUNT_COLUMNS}
+    )
+
+
+_upsert_statements = {}
+
+
+def _apply(connection, deltas: Dict) -> None:
+    rows = [dict(delta, user_id=user_id, phase=phase, item_type=item_type)
+            for (user_id, phase, item_type), delta in deltas.items() if any(delta.values())]
+    if not rows:
+        return
+    dialect_name = connection.dialect.name
+    if dialect_name not in _upsert_statements:
+        _upsert_statements[dialect_name] = _upsert_statement(dialect_name)
+    connection.execute(_upsert_statements[dialect_name], rows)
+
+
+def apply_tracker_inserts(connection, rows: Iterable[Dict]) -> None:
+    """
+    Count tracker rows written with Core (dicts with user_id, phase,
+    item_type and status), in the caller's transaction
+    """
+    deltas = {}
+    for row in rows:
+        _count(deltas, _key(row['user_id'], row.get('phase'), row['item_type']), row.get('status'), 1)
+    _apply(connection, deltas)
+
+
+def _before_and_after(tracker: ProgressTracker) -> Tuple[Tuple, Tuple]:
+    """
+    ((key, status) as last flushed, (key, status) as of this flush)
+    """
+    state = inspect(tracker)
+    old, new = [], []
+    for attr in ('user_id', 'phase', 'item_type', 'status'):
+        history = state.attrs[attr].history
+        new.append(history.added[0] if history.added else (history.unchanged or [None])[0])
+        old.append(history.deleted[0] if history.deleted else (history.unchanged or [None])[0])
+    return (_key(*old[:3]), old[3]), (_key(*new[:3]), new[3])
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# active_history loads the stored value before an expired attribute is
+# overwritten, so the flush always knows which aggregate to decrement
+for _attr in (ProgressTracker.user_id, ProgressTracker.phase, ProgressTracker.item_type, ProgressTracker.status):
+    event.listen(_attr, 'set', _load_previous_value, active_history=True, retval=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_flushed_trackers(session, flush_context):
+    deltas = {}
+    for tracker in session.new:
+        if isinstance(tracker, ProgressTracker):
+            _count(deltas, _key(tracker.user_id, tracker.phase, tracker.item_type), tracker.status, 1)
+    for tracker in session.deleted:
+        if isinstance(tracker, ProgressTracker):
+            (key, status), _ = _before_and_after(tracker)
+            _count(deltas, key, status, -1)
+    for tracker in session.dirty:
+        if isinstance(tracker, ProgressTracker) and session.is_modified(tracker):
+            (old_key, old_status), (new_key, new_status) = _before_and_after(tracker)
+            if (old_key, old_status) != (new_key, new_status):
+                _count(deltas, old_key, old_status, -1)
+                _count(deltas, new_key, new_status, 1)
+    if deltas:
+        _apply(session.connection(), deltas)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _count_bulk_tracker_deletes(orm_execute_state):
+    if not orm_execute_state.is_delete or orm_execute_state.bind_mapper is not inspect(ProgressTracker):
+        return
+    counted = db.select(ProgressTracker.user_id, ProgressTracker.phase, ProgressTracker.item_type,
+                       ProgressTracker.status, db.func.count(ProgressTracker.id)) \
+        .group_by(ProgressTracker.user_id, ProgressTracker.phase, ProgressTracker.item_type, ProgressTracker.status)
+    whereclause = orm_execute_state.statement.whereclause
+    if whereclause is not None:
+        counted = counted.where(whereclause)
+
+    deltas = {}
+    for user_id, phase, item_type, status, count in orm_execute_state.session.execute(counted):
+        _count(deltas, _key(user_id, phase, item_type), status, -count)
+    if deltas:
+        _apply(orm_execute_state.session.connection(), deltas)
+
+
+def _recount_query(user_id: Optional[int] = None):
+    columns = [ProgressTracker.user_id, db.func.coalesce(ProgressTracker.phase, 1), ProgressTracker.item_type,
+               db.func.count(ProgressTracker.id)]
+    columns += [db.func.sum(db.case((db.func.coalesce(ProgressTracker.status, 'not_started') == status, 1), else_=0))
+                for status in STATUSES]
+    query = db.select(*columns).group_by(ProgressTracker.user_id, db.func.coalesce(ProgressTracker.phase, 1),
+                                         ProgressTracker.item_type)
+    if user_id is not None:
+        query = query.where(ProgressTracker.user_id == user_id)
+    return query
+
+
+def rebuild_aggregates(connection, user_id: Optional[int] = None) -> int:
+    """
+    Recompute aggregates (all users, or one) from progress_tracker in the
+    caller's transaction; returns the number of aggregate rows written
+    """
+    table = ProgressAggregate.__table__
+    delete = table.delete()
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+    connection.execute(delete)
+    result = connection.execute(table.insert().from_select(
+        ['user_id', 'phase', 'item_type', 'total', 'not_started', 'in_progress', 'completed'],
+        _recount_query(user_id)
+    ))
+    return result.rowcount
+
+
+def verify_aggregates(user_id: Optional[int] = None) -> List[Dict]:
+    """
+    Aggregate rows that disagree with a recount of progress_tracker
+    """
+    expected = {}
+    for user, phase, item_type, total, *statuses in db.session.execute(_recount_query(user_id)):
+        expected[(user, phase, item_type)] = dict(zip(COUNT_COLUMNS, [total] + [s or 0 for s in statuses]))
+
+    query = ProgressAggregate.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    stored = {(row.user_id, row.phase, row.item_type): {column: getattr(row, column) for column in COUNT_COLUMNS}
+              for row in query.all()}
+
+    empty = dict.fromkeys(COUNT_COLUMNS, 0)
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=lambda k: tuple(str(part) for part in k)):
+        want, have = expected.get(key, empty), stored.get(key, empty)
+        if want != have:
+            mismatches.append({'user_id': key[0], 'phase': key[1], 'item_type': key[2],
+                               'expected': want, 'stored': have})
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verify or rebuild the progress_aggregates table')
+    parser.add_argument('command', choices=('verify', 'rebuild'))
+    parser.add_argument('--user-id', type=int, help='only this user')
+    args = parser.parse_args()
+
+    from app import app
+    from migrations import run_migrations
+
+    with app.app_context():
+        run_migrations()
+        if args.command == 'rebuild':
+            with db.engine.begin() as conn:
+                print(f"Rebuilt {rebuild_aggregates(conn, args.user_id)} aggregate rows")
+        else:
+            mismatches = verify_aggregates(args.user_id)
+            for mismatch in mismatches[:50]:
+                print(mismatch)
+            print(f"{len(mismatches)} mismatched aggregate rows" if mismatches else "Aggregates match progress_tracker")
+            sys.exit(1 if mismatches else 0)
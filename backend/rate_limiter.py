@@ -0,0 +1,239 @@
+import contextvars
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from metrics import registry
+
+# Token buckets in front of the model-backed endpoints: one per user and one
+# global, both charged the estimated model tokens of the operation. Bucket
+# state lives in a SQLite file so every Gunicorn worker on the host draws from
+# the same buckets; a multi-host deployment needs a shared path or store.
+# A request is charged on admission and refunded if it never reached the
+# model (cache hit, local answer, joined another request's flight).
+
+# Estimated prompt + output tokens per operation
+DEFAULT_COSTS = {
+    'analyze_student_profile': 2500,
+    'generate_growth_path': 12000,
+    'generate_single_month': 3000,
+    'generate_linkedin_content': 2000,
+    'generate_task_linkedin_post': 800,
+    'chat': 1500,
+}
+DEFAULT_COST = 1000
+# Rows untouched this long are full buckets and can be dropped
+IDLE_PURGE_SECONDS = 3600
+PURGE_EVERY = 1000
+
+rate_limit_decisions = registry.counter(
+    'rate_limit_decisions_total', 'Rate limiter decisions (allowed, user_limited, global_limited, error)',
+    ('operation', 'outcome'))
+rate_limit_tokens = registry.counter(
+    'rate_limit_tokens_charged_total', 'Estimated model tokens charged to the buckets', ('operation',))
+rate_limit_refunds = registry.counter(
+    'rate_limit_tokens_refunded_total', 'Charged tokens given back to requests that made no model call',
+    ('operation',))
+rate_limit_retry_after = registry.histogram(
+    'rate_limit_retry_after_seconds', 'Retry-After returned to throttled requests', ('scope',),
+    buckets=(1, 2, 5, 10, 30, 60, 120, 300, 600))
+
+
+class TokenBucketLimiter:
+    """
+    Per-user and global token buckets refilled continuously at
+    tokens_per_minute up to burst. A request is admitted only if both
+    buckets hold its cost, and then both are charged in one transaction.
+    """
+
+    def __init__(self, path: Optional[str], user_tokens_per_minute: float, user_burst: float,
+                 global_tokens_per_minute: float, global_burst: float,
+                 costs: Optional[Dict[str, int]] = None, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled and bool(path)
+        self.buckets = {
+            'user': (user_burst, user_tokens_per_minute / 60.0),
+            'global': (global_burst, global_tokens_per_minute / 60.0),
+        }
+        self.costs = dict(DEFAULT_COSTS)
+        if costs:
+            self.costs.update(costs)
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def cost_for(self, operation: str) -> int:
+        return self.costs.get(operation, DEFAULT_COST)
+
+    def acquire(self, user_id, operation: str) -> Dict:
+        """
+        Charge operation to user_id's and the global bucket. Returns
+        {'allowed', 'scope', 'retry_after'}; scope names the bucket that
+        refused, retry_after is whole seconds until it could admit the call.
+        """
+        if not self.enabled:
+            return {'allowed': True, 'scope': None, 'retry_after': 0}
+
+        cost = self.cost_for(operation)
+        keys = {'user': f'user:{user_id}', 'global': 'global'}
+        try:
+            with self._lock:
+                decision = self._acquire(keys, cost, time.time())
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter store must not take the API down with it
+            print(f"Error in rate limiter: {e}")
+            rate_limit_decisions.inc(operation=operation, outcome='error')
+            return {'allowed': True, 'scope': None, 'retry_after': 0}
+
+        if decision['allowed']:
+            rate_limit_decisions.inc(operation=operation, outcome='allowed')
+            rate_limit_tokens.inc(cost, operation=operation)
+        else:
+            rate_limit_decisions.inc(operation=operation, outcome=f"{decision['scope']}_limited")
+            rate_limit_retry_after.observe(decision['retry_after'], scope=decision['scope'])
+        return decision
+
+    def refund(self, user_id, operation: str) -> None:
+        """
+        Give back what acquire charged, for a request that made no model call
+        """
+        if not self.enabled:
+            return
+        cost = self.cost_for(operation)
+        keys = {'user': f'user:{user_id}', 'global': 'global'}
+        try:
+            with self._lock:
+                self._refund(keys, cost, time.time())
+        except sqlite3.Error as e:
+            print(f"Error in rate limiter: {e}")
+            return
+        rate_limit_refunds.inc(cost, operation=operation)
+
+    def _refund(self, keys: Dict[str, str], cost: int, now: float) -> None:
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = {}
+            for scope, key in keys.items():
+                capacity, rate = self.buckets[scope]
+                row = conn.execute('SELECT tokens, updated_at FROM token_buckets WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    tokens = min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                    levels[key] = min(capacity, tokens + min(cost, capacity))
+            conn.executemany(
+                'INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                [(key, tokens, now) for key, tokens in levels.items()]
+            )
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    def _acquire(self, keys: Dict[str, str], cost: int, now: float) -> Dict:
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels = {}
+            for scope, key in keys.items():
+                capacity, rate = self.buckets[scope]
+                row = conn.execute('SELECT tokens, updated_at FROM token_buckets WHERE key = ?', (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                # An operation bigger than the burst would otherwise never be admitted
+                needed = min(cost, capacity)
+                if tokens < needed:
+                    conn.execute('ROLLBACK')
+                    retry_after = math.ceil((needed - tokens) / rate) if rate > 0 else IDLE_PURGE_SECONDS
+                    return {'allowed': False, 'scope': scope, 'retry_after': max(1, retry_after)}
+                levels[key] = tokens - needed
+
+            conn.executemany(
+                'INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                [(key, tokens, now) for key, tokens in levels.items()]
+            )
+            self._calls += 1
+            if self._calls % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM token_buckets WHERE key != 'global' AND updated_at < ?",
+                             (now - IDLE_PURGE_SECONDS,))
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        return {'allowed': True, 'scope': None, 'retry_after': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Re-open after fork so Gunicorn workers never share a handle
+        if self._conn is None or self._conn_pid != os.getpid():
+            # Autocommit mode; _acquire manages its own BEGIN IMMEDIATE transactions
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS token_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn_pid = os.getpid()
+        return self._conn
+
+
+# Model round trips made for the current request. The counter is shared by
+# reference with asyncio tasks and threads started from a copy of the context.
+_request_model_calls = contextvars.ContextVar('request_model_calls', default=None)
+
+
+def track_model_calls() -> Dict[str, int]:
+    """
+    Start counting model calls for the current request
+    """
+    calls = {'count': 0}
+    _request_model_calls.set(calls)
+    return calls
+
+
+def stop_tracking_model_calls() -> None:
+    _request_model_calls.set(None)
+
+
+def note_model_call() -> None:
+    """
+    Called right before each model round trip
+    """
+    calls = _request_model_calls.get()
+    if calls is not None:
+        calls['count'] += 1
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    """
+    Process-wide limiter configured from RATE_LIMIT_* environment variables.
+    RATE_LIMIT_COST_<OPERATION> overrides one operation's token estimate.
+    """
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            costs = {}
+            for operation in DEFAULT_COSTS:
+                value = os.getenv(f'RATE_LIMIT_COST_{operation.upper()}')
+                if value:
+                    costs[operation] = int(value)
+            _shared_limiter = TokenBucketLimiter(
+                path=os.getenv('RATE_LIMIT_PATH', 'rate_limits.db') or None,
+                user_tokens_per_minute=float(os.getenv('RATE_LIMIT_USER_TOKENS_PER_MINUTE', '10000')),
+                user_burst=float(os.getenv('RATE_LIMIT_USER_BURST', '60000')),
+                global_tokens_per_minute=float(os.getenv('RATE_LIMIT_GLOBAL_TOKENS_PER_MINUTE', '600000')),
+                global_burst=float(os.getenv('RATE_LIMIT_GLOBAL_BURST', '1200000')),
+                costs=costs,
+                enabled=os.getenv('RATE_LIMIT_ENABLED', '1') != '0'
+            )
+        return _shared_limiter
@@ -1,5 +1,8 @@
 import os
+from sqlalchemy import text
+
 from app import app, db
+from migrations import run_migrations
 
 def reset_database():
     print("Resetting database...")
@@ -17,11 +20,13 @@ def reset_database():
     with app.app_context():
         try:
             db.drop_all()
+            with db.engine.begin() as conn:
+                conn.execute(text('DROP TABLE IF EXISTS schema_migrations'))
             print("Dropped all tables.")
         except Exception as e:
             print(f"Warning dropping tables: {e}")
             
-        db.create_all()
+        run_migrations()
         print("Created all tables with new schema.")
         
     print("Database reset complete. Please restart the Flask server.")
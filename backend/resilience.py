@@ -0,0 +1,243 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+from metrics import registry
+
+# Retries with exponential backoff and full jitter for transient model errors
+# (429, 5xx, timeouts, dropped connections), plus a circuit breaker per model
+# that fails fast while the backend is unhealthy and lets a single probe
+# through once the cool-down has passed.
+
+RETRY_MAX_ATTEMPTS = int(os.getenv('LLM_RETRY_MAX_ATTEMPTS', '3'))
+RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Transport errors by class name, so httpx and the SDK are not imported here
+RETRYABLE_ERROR_NAMES = {'TimeoutException', 'ConnectTimeout', 'ReadTimeout', 'WriteTimeout', 'PoolTimeout',
+                         'ConnectError', 'ReadError', 'RemoteProtocolError', 'ServerError', 'TimeoutError'}
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+llm_retries = registry.counter(
+    'llm_retries_total', 'Model calls retried after a transient error', ('method', 'error'))
+llm_breaker_state = registry.gauge(
+    'llm_circuit_state', 'Circuit breaker state per model (0 closed, 1 half-open, 2 open)', ('model',))
+llm_breaker_transitions = registry.counter(
+    'llm_circuit_transitions_total', 'Circuit breaker state changes', ('model', 'state'))
+llm_breaker_rejections = registry.counter(
+    'llm_circuit_rejections_total', 'Calls failed fast by an open circuit', ('method', 'model'))
+
+# Absolute time.perf_counter() deadline of the work in progress, if any
+_call_deadline = contextvars.ContextVar('llm_call_deadline', default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose circuit is open"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES or isinstance(error, asyncio.TimeoutError)
+
+
+@contextlib.contextmanager
+def call_deadline(seconds: float) -> Iterator[None]:
+    """
+    Model calls made inside the block stop retrying once seconds have passed
+    """
+    deadline = time.perf_counter() + seconds
+    current = _call_deadline.get()
+    token = _call_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _call_deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    return _call_deadline.get()
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive transient failures. While open,
+    calls are rejected; after reset_seconds one probe call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        llm_breaker_state.set(0, model=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+            # Half-open: one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self._state != OPEN:
+                    self._transition(OPEN)
+
+    def release(self) -> None:
+        # Call finished with an error that says nothing about backend health
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        llm_breaker_state.set(_STATE_VALUES[state], model=self.name)
+        llm_breaker_transitions.inc(model=self.name, state=state)
+        print(f"Circuit for {self.name} is now {state}")
+
+    def snapshot(self) -> Dict:
+        state = self.state
+        with self._lock:
+            return {'state': state, 'consecutive_failures': self._failures}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(model)
+            _breakers[model] = breaker
+        return breaker
+
+
+def breaker_states() -> Dict[str, Dict]:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {model: breaker.snapshot() for model, breaker in sorted(breakers.items())}
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Full-jitter delay before retry number attempt (1-based)
+    """
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+def _next_delay(method: str, attempt: int, error: BaseException, deadline: Optional[float]) -> Optional[float]:
+    """
+    Seconds to wait before retrying, or None if the error should propagate
+    """
+    if attempt >= RETRY_MAX_ATTEMPTS or not is_retryable(error):
+        return None
+    delay = backoff_delay(attempt)
+    if deadline is not None and time.perf_counter() + delay >= deadline:
+        return None
+    llm_retries.inc(method=method, error=type(error).__name__)
+    return delay
+
+
+def call_with_retries(method: str, model: str, send: Callable[[], Any], deadline: Optional[float] = None) -> Any:
+    """
+    send() through the model's circuit breaker, retrying transient errors
+    with backoff while attempts and the deadline allow
+    """
+    breaker = get_breaker(model)
+    deadline = deadline if deadline is not None else current_deadline()
+    attempt = 0
+    while True:
+        attempt += 1
+        if not breaker.allow():
+            llm_breaker_rejections.inc(method=method, model=model)
+            raise CircuitOpenError(f"circuit for {model} is open")
+        try:
+            result = send()
+        except Exception as e:
+            if is_retryable(e):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            delay = _next_delay(method, attempt, e, deadline)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+async def async_call_with_retries(method: str, model: str, send: Callable[[], Awaitable[Any]],
+                                  deadline: Optional[float] = None) -> Any:
+    """
+    Coroutine counterpart of call_with_retries
+    """
+    breaker = get_breaker(model)
+    attempt = 0
+    while True:
+        attempt += 1
+        if not breaker.allow():
+            llm_breaker_rejections.inc(method=method, model=model)
+            raise CircuitOpenError(f"circuit for {model} is open")
+        try:
+            result = await send()
+        except asyncio.CancelledError:
+            # Deadline fired mid-call: the outcome is unknown, so free the probe slot only
+            breaker.release()
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            delay = _next_delay(method, attempt, e, deadline)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
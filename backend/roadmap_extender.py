@@ -0,0 +1,168 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from jobs import acquire_lease, release_lease
+from metrics import registry
+from models import db, GrowthPath, ProgressTracker
+
+# Extends active roadmaps before users reach their last month, so the progress
+# update path never waits on a year-long generation. One process at a time runs
+# a cycle (guarded by a scheduler lease); within a cycle, extensions run on a
+# bounded thread pool.
+
+EXTEND_AHEAD_MONTHS = int(os.getenv('ROADMAP_EXTEND_AHEAD_MONTHS', '2'))
+EXTEND_MONTHS = int(os.getenv('ROADMAP_EXTEND_MONTHS', '12'))
+EXTEND_CONCURRENCY = int(os.getenv('ROADMAP_EXTEND_CONCURRENCY', '4'))
+EXTEND_BATCH_SIZE = int(os.getenv('ROADMAP_EXTEND_BATCH_SIZE', '50'))
+EXTEND_INTERVAL_SECONDS = float(os.getenv('ROADMAP_EXTEND_INTERVAL', '60'))
+# A path whose extension fails or adds nothing (e.g. no profile) waits this
+# long before the next attempt, doubling per consecutive attempt up to the max
+EXTEND_RETRY_SECONDS = float(os.getenv('ROADMAP_EXTEND_RETRY_SECONDS', '600'))
+EXTEND_RETRY_MAX_SECONDS = float(os.getenv('ROADMAP_EXTEND_RETRY_MAX_SECONDS', '86400'))
+
+_LEASE_NAME = 'roadmap_extender'
+
+extender_cycles = registry.counter(
+    'roadmap_extender_cycles_total', 'Extender cycles, by whether this process held the lease', ('result',))
+extender_extensions = registry.counter(
+    'roadmap_extensions_total', 'Roadmap extensions by outcome', ('outcome',))
+extender_due = registry.gauge(
+    'roadmap_extender_due', 'Roadmaps found within the look-ahead window in the last cycle')
+extender_cycle_seconds = registry.histogram(
+    'roadmap_extender_cycle_seconds', 'Duration of an extender cycle')
+
+
+def find_due_growth_paths(ahead_months: int = EXTEND_AHEAD_MONTHS, limit: int = EXTEND_BATCH_SIZE) -> List[int]:
+    """
+    Active growth paths whose last planned month is at most ahead_months
+    past the user's current month, least recently attempted first and
+    without those still backing off from a failed attempt. The last month
+    comes from the trackers, so this is one grouped query rather than a
+    parse of every roadmap document.
+    """
+    last_month = db.func.max(ProgressTracker.phase)
+    rows = db.session.query(GrowthPath.id) \
+        .join(ProgressTracker, ProgressTracker.user_id == GrowthPath.user_id) \
+        .filter(GrowthPath.is_active == True) \
+        .filter(db.or_(GrowthPath.extend_retry_at == None, GrowthPath.extend_retry_at <= datetime.utcnow())) \
+        .group_by(GrowthPath.id) \
+        .having(last_month - GrowthPath.current_month <= ahead_months) \
+        .order_by(GrowthPath.extend_retry_at.asc().nulls_first(), GrowthPath.id) \
+        .limit(limit) \
+        .all()
+    return [row.id for row in rows]
+
+
+class RoadmapExtender:
+    """
+    Periodic batch runner. extend_fn(growth_path_id, ahead_months, months)
+    performs one extension inside an app context and returns the number of
+    months added (0 if nothing was needed).
+    """
+
+    def __init__(self, app, extend_fn: Callable[[int, int, int], int],
+                 ahead_months: int = EXTEND_AHEAD_MONTHS, months: int = EXTEND_MONTHS,
+                 concurrency: int = EXTEND_CONCURRENCY, batch_size: int = EXTEND_BATCH_SIZE,
+                 interval: float = EXTEND_INTERVAL_SECONDS):
+        self.app = app
+        self.extend_fn = extend_fn
+        self.ahead_months = ahead_months
+        self.months = months
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def owner(self) -> str:
+        # Per thread, so a manual run_once() can't share the background loop's lease
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        One cycle: find due roadmaps and extend them. Skipped if another
+        process holds the lease.
+        """
+        started = time.perf_counter()
+        # The lease outlives the worst-case cycle so a slow cycle isn't run twice
+        with self.app.app_context():
+            if not acquire_lease(_LEASE_NAME, self.owner, max(self.interval, 60) * 10):
+                extender_cycles.inc(result='skipped')
+                return {'due': 0, 'extended': 0, 'failed': 0, 'skipped': 1}
+            due = find_due_growth_paths(self.ahead_months, self.batch_size)
+        extender_due.set(len(due))
+
+        counts = {'due': len(due), 'extended': 0, 'failed': 0, 'skipped': 0}
+        try:
+            if due:
+                with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='roadmap-extender') as pool:
+                    for outcome in pool.map(self._extend, due):
+                        counts[outcome] += 1
+        finally:
+            with self.app.app_context():
+                release_lease(_LEASE_NAME, self.owner)
+        extender_cycles.inc(result='ran')
+        extender_cycle_seconds.observe(time.perf_counter() - started)
+        return counts
+
+    def _extend(self, growth_path_id: int) -> str:
+        with self.app.app_context():
+            try:
+                added = self.extend_fn(growth_path_id, self.ahead_months, self.months)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error extending growth path {growth_path_id}: {e}")
+                added = None
+            self._record_attempt(growth_path_id, bool(added))
+        outcome = 'failed' if added is None else 'extended' if added else 'skipped'
+        extender_extensions.inc(outcome=outcome)
+        return outcome
+
+    def _record_attempt(self, growth_path_id: int, extended: bool) -> None:
+        """
+        Reset the backoff after an extension, otherwise push the next attempt
+        back so paths that keep failing can't crowd the batch out every cycle
+        """
+        growth_path = db.session.get(GrowthPath, growth_path_id)
+        if not growth_path:
+            return
+        if extended:
+            growth_path.extend_failures = 0
+            growth_path.extend_retry_at = None
+        else:
+            failures = (growth_path.extend_failures or 0) + 1
+            delay = min(EXTEND_RETRY_SECONDS * 2 ** (failures - 1), EXTEND_RETRY_MAX_SECONDS)
+            growth_path.extend_failures = failures
+            growth_path.extend_retry_at = datetime.utcnow() + timedelta(seconds=delay)
+        db.session.commit()
+
+    def start(self) -> None:
+        with self._lock:
+            # Threads do not survive fork; each process starts its own (the lease serialises cycles)
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name='roadmap-extender', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error in roadmap extender: {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,139 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, field_validator
+
+# Response shapes for every structured Gemini call. The same models are sent
+# to the API as response schemas and used to validate what comes back.
+
+
+class ProfileAnalysis(BaseModel):
+    strengths: List[str] = []
+    gaps: List[str] = []
+    career_paths: List[str] = []
+    learning_tips: List[str] = []
+
+
+class Course(BaseModel):
+    id: str
+    name: str
+    platform: Optional[str] = None
+    duration: Optional[str] = None
+    rationale: Optional[str] = None
+
+
+class Test(BaseModel):
+    id: str
+    name: str
+    target_score: Optional[str] = None
+    timing: Optional[str] = None
+    rationale: Optional[str] = None
+
+
+class Internship(BaseModel):
+    id: str
+    type: str
+    when: Optional[str] = None
+    companies: List[str] = []
+    rationale: Optional[str] = None
+
+
+class Certificate(BaseModel):
+    id: str
+    name: str
+    provider: Optional[str] = None
+    timing: Optional[str] = None
+    rationale: Optional[str] = None
+
+
+class Project(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    skills_demonstrated: List[str] = []
+    rationale: Optional[str] = None
+
+
+class RoadmapPhase(BaseModel):
+    phase: int
+    title: str
+    focus: Optional[str] = None
+    courses: List[Course] = []
+    tests: List[Test] = []
+    internships: List[Internship] = []
+    certificates: List[Certificate] = []
+    projects: List[Project] = []
+
+
+class Roadmap(BaseModel):
+    phases: List[RoadmapPhase] = []
+
+
+class MonthTask(BaseModel):
+    id: str
+    type: str
+    name: str
+    description: Optional[str] = None
+    duration: Optional[str] = None
+    rationale: Optional[str] = None
+
+    @field_validator('type')
+    @classmethod
+    def normalize_type(cls, value: str) -> str:
+        # Trackers only know these types; the prompt's "course|project|certificate" is sometimes echoed back
+        value = value.strip().lower()
+        return value if value in ('course', 'project', 'certificate', 'test', 'internship') else 'course'
+
+
+class MonthPlan(BaseModel):
+    month: int
+    title: str
+    focus: Optional[str] = None
+    tasks: List[MonthTask] = []
+    motivation: Optional[str] = None
+
+
+class ChatReply(BaseModel):
+    response: str
+    action: str = 'none'
+    encouragement_score: int = 5
+
+    @field_validator('action')
+    @classmethod
+    def normalize_action(cls, value: str) -> str:
+        value = value.strip().lower()
+        return value if value in ('none', 'adjust_projects', 'adjust_pace', 'skip_task') else 'none'
+
+
+class PostIdea(BaseModel):
+    topic: str
+    draft: str
+    hashtags: List[str] = []
+
+
+class LinkedInContent(BaseModel):
+    post_ideas: List[PostIdea] = []
+    profile_summary: str = ''
+    skills_to_add: List[str] = []
+
+
+class TaskLinkedInPost(BaseModel):
+    post_content: str
+    hashtags: List[str] = []
+    suggested_image: Optional[str] = None
+
+
+class ResumeBullets(BaseModel):
+    bullets: List[str] = []
+
+
+class Encouragement(BaseModel):
+    id: str
+    message: str
+
+
+class EncouragementBatch(BaseModel):
+    messages: List[Encouragement] = []
+
+
+class ConversationSummary(BaseModel):
+    summary: str
@@ -0,0 +1,104 @@
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+
+def make_flight_key(user_id: Any, operation: str, params: Any = None) -> str:
+    """
+    Key for coalescing endpoint work: user plus operation plus a hash of the inputs
+    """
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=repr).encode('utf-8')).hexdigest()
+    return f"{user_id}:{operation}:{digest[:16]}"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls across threads: the first caller for
+    a key runs the function, callers arriving while it is in flight wait and
+    receive (a copy of) the same result or exception.
+    Scope is one process; separate Gunicorn workers do not coalesce with each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {'leaders': 0, 'followers': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._stats['leaders'] += 1
+            else:
+                self._stats['followers'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._flights))
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight. The shared computation runs as its
+    own task, so a waiter that is cancelled (e.g. hits its deadline) does not
+    cancel it for the others.
+    """
+
+    def __init__(self):
+        self._flights = weakref.WeakKeyDictionary()  # loop -> {key: task}
+        self._stats = {'leaders': 0, 'followers': 0}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable]) -> Any:
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        task = flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            flights[key] = task
+            task.add_done_callback(lambda _: flights.pop(key, None))
+            self._stats['leaders'] += 1
+            return await asyncio.shield(task)
+
+        self._stats['followers'] += 1
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def stats(self) -> Dict[str, int]:
+        in_flight = sum(len(flights) for flights in self._flights.values())
+        return dict(self._stats, in_flight=in_flight)
+
+
+# Process-wide instances: model calls (keyed on method + cache key) and
+# generating endpoints (keyed on user + operation + input hash)
+llm_flight = SingleFlight()
+async_llm_flight = AsyncSingleFlight()
+endpoint_flight = SingleFlight()
@@ -0,0 +1,122 @@
+import json
+import re
+import threading
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_DANGLING_KEY = re.compile(r',?\s*"(?:[^"\\]|\\.)*"\s*:\s*$')
+_MAX_REPAIR_CUTS = 25
+
+
+class StructuredOutputError(ValueError):
+    """Raised when model output cannot be parsed into its schema, even after repair"""
+
+
+_stats_lock = threading.Lock()
+_parse_stats = {}
+
+
+def _record(method: str, outcome: str) -> None:
+    with _stats_lock:
+        counters = _parse_stats.setdefault(method, {'valid': 0, 'repaired': 0, 'failed': 0})
+        counters[outcome] += 1
+
+
+def parse_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Parse outcomes per method: valid on first pass, locally repaired, or failed (fallback used)
+    """
+    with _stats_lock:
+        return {method: dict(counters) for method, counters in _parse_stats.items()}
+
+
+def structured_config(schema: Type[BaseModel], config: Optional[Dict] = None) -> Dict:
+    """
+    Generation config asking the model for JSON conforming to schema
+    """
+    structured = dict(config or {})
+    structured['response_mime_type'] = 'application/json'
+    structured['response_schema'] = schema
+    return structured
+
+
+def parse_structured(text: str, schema: Type[BaseModel], method: str = 'unknown') -> Dict:
+    """
+    Parse and validate model output in one pass. Output that is not valid as
+    is (markdown fences, surrounding prose, trailing commas, truncation) is
+    repaired locally instead of spending another round trip on the model.
+    """
+    try:
+        result = schema.model_validate_json(text)
+        _record(method, 'valid')
+    except ValidationError:
+        try:
+            result = schema.model_validate(repair_json(text))
+        except (ValueError, ValidationError) as e:
+            _record(method, 'failed')
+            raise StructuredOutputError(f"{method}: output does not match {schema.__name__}: {e}") from e
+        _record(method, 'repaired')
+    return result.model_dump(exclude_none=True)
+
+
+def repair_json(text: str) -> Any:
+    """
+    Best-effort recovery of a JSON value from raw model output
+    """
+    text = (text or '').strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else text[3:]
+    if text.endswith('```'):
+        text = text[:-3]
+
+    starts = [i for i in (text.find('{'), text.find('[')) if i != -1]
+    if not starts:
+        raise ValueError('no JSON value found')
+    text = _TRAILING_COMMA.sub(r'\1', text[min(starts):].strip())
+
+    # Complete documents, possibly followed by prose
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text)
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    # Truncated output: close whatever is still open, trimming the last
+    # incomplete member until the result parses
+    candidate = text
+    for _ in range(_MAX_REPAIR_CUTS):
+        try:
+            return json.loads(_TRAILING_COMMA.sub(r'\1', _close_open_structures(candidate)))
+        except json.JSONDecodeError:
+            cut = candidate.rfind(',')
+            if cut <= 0:
+                break
+            candidate = candidate[:cut]
+    raise ValueError('unable to repair JSON output')
+
+
+def _close_open_structures(text: str) -> str:
+    stack = []
+    in_string = False
+    escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+
+    closed = text + '"' if in_string else text
+    # Drop a key whose value never arrived
+    closed = _DANGLING_KEY.sub('', closed)
+    return closed + ''.join(reversed(stack))
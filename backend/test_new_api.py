@@ -1,11 +1,12 @@
-from google import genai
 import os
 from dotenv import load_dotenv
 
+from llm_backends import get_client
+
 load_dotenv()
 
-# Initialize client
-client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+# Shared, connection-pooled client (same one the services use)
+client = get_client(os.getenv('GEMINI_API_KEY'))
 
 # Try to generate content
 model_names = ['gemini-2.0-flash-exp', 'gemini-2.0-flash', 'gemini-1.5-flash', 'models/gemini-2.0-flash-exp']
@@ -0,0 +1,72 @@
+import os
+from typing import Dict, Iterable, List
+
+from models import db, ProgressTracker
+from progress_stats import apply_tracker_inserts
+
+# Turns generated roadmap phases and month plans into progress_tracker rows
+# and writes them with batched executemany INSERTs instead of one ORM object
+# (and one unit-of-work entry) per task.
+
+TRACKER_INSERT_BATCH_SIZE = int(os.getenv('TRACKER_INSERT_BATCH_SIZE', '1000'))
+
+# Roadmap phase key -> tracker item_type
+PHASE_SECTIONS = (
+    ('courses', 'course'),
+    ('tests', 'test'),
+    ('internships', 'internship'),
+    ('certificates', 'certificate'),
+    ('projects', 'project'),
+)
+
+
+def _row(user_id: int, phase: int, item_id: str, item_type: str, item_name: str, notes=None) -> Dict:
+    # Every row carries the same keys so a batch is a single executemany
+    return {'user_id': user_id, 'item_id': item_id, 'item_type': item_type, 'item_name': item_name,
+            'status': 'not_started', 'phase': phase, 'notes': notes}
+
+
+def roadmap_tracker_rows(user_id: int, phases: Iterable[Dict]) -> List[Dict]:
+    """
+    One row per course, test, internship, certificate and project of each phase
+    """
+    rows = []
+    for phase in phases:
+        phase_num = phase.get('phase', 1)
+        for section, item_type in PHASE_SECTIONS:
+            for item in phase.get(section, []):
+                if item_type == 'internship':
+                    name = item.get('type', item.get('name', 'Internship'))
+                else:
+                    name = item['name']
+                rows.append(_row(user_id, phase_num, item['id'], item_type, name))
+    return rows
+
+
+def month_plan_tracker_rows(user_id: int, month: int, month_data: Dict) -> List[Dict]:
+    """
+    One row per task of a generated month plan
+    """
+    return [_row(user_id, month, task['id'], task['type'], task['name'], task.get('description', ''))
+            for task in month_data.get('tasks', [])]
+
+
+def insert_trackers(rows: List[Dict], batch_size: int = TRACKER_INSERT_BATCH_SIZE) -> int:
+    """
+    Insert tracker rows (from any number of users) in the current session's
+    transaction and count them into progress_aggregates; the caller commits
+    """
+    if not rows:
+        return 0
+    table = ProgressTracker.__table__
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+    apply_tracker_inserts(db.session.connection(), rows)
+    return len(rows)
+
+
+def materialize_roadmap(user_id: int, phases: Iterable[Dict]) -> int:
+    """
+    Create the trackers for roadmap phases; returns how many were added
+    """
+    return insert_trackers(roadmap_tracker_rows(user_id, phases))
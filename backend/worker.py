@@ -0,0 +1,27 @@
+"""
+Standalone background worker: runs queued jobs and the roadmap extender.
+Run alongside Gunicorn with JOB_WORKERS_IN_PROCESS=0 set for the web workers:
+
+    python worker.py                 # run until interrupted
+    python worker.py --extend-once   # one extender cycle, then exit
+"""
+import argparse
+import os
+
+from app import app, job_worker, roadmap_extender
+from migrations import run_migrations
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Background job worker and roadmap extender')
+    parser.add_argument('--extend-once', action='store_true', help='run one roadmap extender cycle and exit')
+    args = parser.parse_args()
+
+    with app.app_context():
+        run_migrations()
+
+    if args.extend_once:
+        print(roadmap_extender.run_once())
+    else:
+        print(f"Job worker started with {job_worker.threads} threads (pid {os.getpid()})")
+        roadmap_extender.start()
+        job_worker.run_forever()
@@ -353,25 +353,15 @@ function initOnboarding() {
             console.log('Onboard data:', onboardData);
             AppState.currentUser = { id: userId, ...data };
 
-            // Generate growth path
+            // Generate growth path, month by month as the model writes it
             console.log('Generating growth path...');
-            const roadmapResponse = await fetch(`${API_BASE_URL}/growth-path/generate`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    user_id: userId,
-                    timeline_months: timeline
-                })
+            await streamGrowthPath(userId, timeline, (phase, received) => {
+                if (received === 1) {
+                    hideLoading();
+                }
+                showStatusMessage('onboarding-status', `Month ${phase.phase} of ${timeline} ready...`, 'success');
             });
 
-            console.log('Roadmap response status:', roadmapResponse.status);
-
-            if (!roadmapResponse.ok) {
-                const errorText = await roadmapResponse.text();
-                console.error('Roadmap generation error:', errorText);
-                throw new Error('Failed to generate growth path');
-            }
-
             console.log('Growth path generated successfully!');
 
             hideLoading();
@@ -392,6 +382,66 @@ function initOnboarding() {
     });
 }
 
+async function streamGrowthPath(userId, timelineMonths, onPhase) {
+    // Reads the server-sent events of /growth-path/generate/stream and calls
+    // onPhase for every month as soon as it has been generated and saved
+    const response = await fetch(`${API_BASE_URL}/growth-path/generate/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            user_id: userId,
+            timeline_months: timelineMonths
+        })
+    });
+
+    console.log('Roadmap response status:', response.status);
+
+    if (!response.ok || !response.body) {
+        const errorText = await response.text();
+        console.error('Roadmap generation error:', errorText);
+        throw new Error('Failed to generate growth path');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let received = 0;
+    let result = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            const eventLine = rawEvent.split('\n').find(line => line.startsWith('event: '));
+            const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+            if (!eventLine || !dataLine) continue;
+
+            const eventName = eventLine.slice(7);
+            const payload = JSON.parse(dataLine.slice(6));
+
+            if (eventName === 'phase') {
+                received += 1;
+                onPhase(payload, received);
+            } else if (eventName === 'complete') {
+                result = payload;
+            } else if (eventName === 'error') {
+                throw new Error(payload.error || 'Failed to generate growth path');
+            }
+        }
+    }
+
+    if (!result) {
+        throw new Error('Growth path generation ended unexpectedly');
+    }
+    return result;
+}
+
 async function getUserIdByEmail(email) {
     // Helper to get user ID when already registered
     return 1; // Simplified for demo